@@ -0,0 +1,69 @@
+""" This module chooses the conditions of a block one trial at a time, where they are the most needed, instead of
+drawing them all before the block (Design.buildDesign). T2|T1 accuracy is estimated for every lag and distance (a Beta
+posterior from a Jeffreys prior); the next trial goes to the condition whose confidence interval is the widest, and the
+block stops as soon as every interval is narrower than the target width, ui.trialMax trials at most.
+
+The next trial is drawn while the participant answers the current one, so the answers of a trial are only used from
+the trial after next: the conditions depend on the seed and the answers only, whatever the timing, and the session can
+be replayed (Replay.py). The trials chosen but not answered yet count as expected answers, so that they do not all go
+to the same condition."""
+
+from statistics import NormalDist
+
+import numpy as np
+
+from Design import DISTANCE, FIRST_FRAME, LAG, LAGS, LAST_FRAME, designCells, fillConditions
+
+
+def intervalWidths(seen, both, z):  # width of the interval of the accuracy of every condition, Jeffreys prior
+    a = both + 0.5
+    b = seen - both + 0.5
+    return 2 * z * np.sqrt(a * b / ((a + b) ** 2 * (a + b + 1)))
+
+
+class AdaptiveDesign:
+    def __init__(self, streams, targets, width, rng, lags=LAGS, minTrials=2, confidence=0.95,
+                 firstFrame=FIRST_FRAME, lastFrame=LAST_FRAME):
+        self.streams = streams
+        self.targets = targets
+        self.width = width          # target width of the interval of T2|T1 accuracy, in every condition
+        self.rng = rng              # draws the conditions of every trial, in order
+        self.minTrials = minTrials  # trials with T1 reported before the interval of a condition is trusted
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.firstFrame = firstFrame
+        self.lastFrame = lastFrame
+        self.cells = designCells(streams, lags)
+        self.seen = np.zeros(len(self.cells))  # trials with T1 reported, per condition
+        self.both = np.zeros(len(self.cells))  # and T2 too
+        self.chosen = []                       # condition of every row so far
+        self.answers = {}                      # row: outcomes of T1 and T2, not in seen and both yet
+        self.used = 0                          # rows before this one are in seen and both
+
+    def use(self, rows):  # adds the answers of the rows before rows to the estimates
+        while self.used < rows and self.used in self.answers:
+            outcome1, outcome2 = self.answers.pop(self.used)
+            cell = self.chosen[self.used]
+            self.seen[cell] += outcome1
+            self.both[cell] += outcome1 * outcome2
+            self.used += 1
+
+    def choose(self, design, row):  # draws the conditions of design[row], from the answers to the rows before row - 1
+        self.use(row - 1)
+        pending = np.bincount(self.chosen[self.used:row], minlength=len(self.cells))
+        mean = (self.both + 0.5) / (self.seen + 1)
+        widths = intervalWidths(self.seen + pending, self.both + pending * mean, self.z)
+        widest = np.flatnonzero(widths >= widths.max() - 1e-9)
+        cell = int(widest[self.rng.integers(len(widest))])  # ties drawn at random
+        self.chosen.append(cell)
+        design[row, LAG], design[row, DISTANCE] = self.cells[cell]
+        fillConditions(design[row:row + 1], self.streams, self.targets, self.firstFrame, self.lastFrame, self.rng)
+
+    def record(self, row, outcomes):  # answers to the trial of design[row], 1 if correct
+        self.answers[row] = (int(outcomes[0] == 1), int(outcomes[1] == 1))
+
+    def done(self):  # True once every condition is precise enough, with every answer so far
+        seen, both = self.seen.copy(), self.both.copy()
+        for row, (outcome1, outcome2) in self.answers.items():
+            seen[self.chosen[row]] += outcome1
+            both[self.chosen[row]] += outcome1 * outcome2
+        return bool((seen >= self.minTrials).all() and (intervalWidths(seen, both, self.z) <= self.width).all())
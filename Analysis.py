@@ -0,0 +1,131 @@
+""" This module computes the attentional blink curves from the results: T1 accuracy and T2 accuracy given T1 was
+reported (T2|T1), per participant and pooled, for every lag and distance between the targets. The results database or
+.csv files (in the format of the original experiment, header or not) are read in chunks through TrialData, and every
+chunk is reduced to counts per participant and condition with NumPy, so the size of the files does not matter.
+
+python Analysis.py attentionalBlink.db                          prints the pooled blink curves
+python Analysis.py attentionalBlink.db old.csv --out blink      also writes blink_participants.csv, blink_pooled.csv
+                                                                and blink_lags.csv
+"""
+
+import argparse
+import csv
+import math
+
+import numpy as np
+
+from TrialData import readChunks
+
+# counts kept for every participant and condition
+TRIALS, SEEN_T1, SEEN_BOTH, SEEN_T2 = range(4)
+
+
+def chunkCounts(chunk):
+    """ Reduces a chunk of trials to {(name, email, lag, distance): counts}, the lag in seconds. The group-by runs on
+    integer codes, the strings are only looked at once per group."""
+    names, nameCodes = np.unique(np.asarray(chunk['name']), return_inverse=True)
+    emails, emailCodes = np.unique(np.asarray(chunk['email']), return_inverse=True)
+    lagMs = np.rint(chunk['diffTime'] * 1000).astype(np.int64)  # rounded, to group lags stored as floats
+    keys = np.column_stack([nameCodes, emailCodes, lagMs, chunk['distanceIndex']])
+    groups, group = np.unique(keys, axis=0, return_inverse=True)
+    group = group.ravel()
+
+    seenT1 = chunk['outcome1'] == 1
+    seenT2 = chunk['outcome2'] == 1
+    counts = np.column_stack([np.bincount(group, minlength=len(groups)),
+                              np.bincount(group, seenT1, len(groups)),
+                              np.bincount(group, seenT1 & seenT2, len(groups)),
+                              np.bincount(group, seenT2, len(groups))]).astype(np.int64)
+    return {(str(names[n]), str(emails[e]), lag / 1000, int(distance)): row
+            for (n, e, lag, distance), row in zip(groups, counts)}
+
+
+def countTrials(paths, chunkRows=100000):  # counts per participant and condition, over every file
+    totals = {}
+    for path in paths:
+        for chunk in readChunks(path, chunkRows):
+            for key, counts in chunkCounts(chunk).items():
+                if key in totals:
+                    totals[key] += counts
+                else:
+                    totals[key] = counts
+    return totals
+
+
+def ratio(numerator, denominator):
+    return numerator / denominator if denominator else float('nan')
+
+
+def participantTable(totals):  # one row per participant, lag and distance
+    rows = []
+    for (name, email, lag, distance), counts in sorted(totals.items()):
+        rows.append({'name': name, 'email': email, 'lag': lag, 'distance': distance, 'trials': int(counts[TRIALS]),
+                     'accuracyT1': ratio(counts[SEEN_T1], counts[TRIALS]),
+                     'accuracyT2givenT1': ratio(counts[SEEN_BOTH], counts[SEEN_T1]),
+                     'accuracyT2': ratio(counts[SEEN_T2], counts[TRIALS])})
+    return rows
+
+
+def pooledTable(totals, byDistance=True):
+    """ One row per lag (and distance): accuracies over all the trials pooled together, and T2|T1 averaged over
+    participants with its standard error, each participant counting once."""
+    conditions = {}
+    for (name, email, lag, distance), counts in totals.items():
+        condition = (lag, distance) if byDistance else (lag,)
+        participants = conditions.setdefault(condition, {})
+        key = (name, email)
+        participants[key] = participants[key] + counts if key in participants else counts.copy()
+
+    rows = []
+    for condition, participants in sorted(conditions.items()):
+        counts = np.array(list(participants.values()))
+        pooled = counts.sum(axis=0)
+        seen = counts[:, SEEN_T1] > 0
+        means = counts[seen, SEEN_BOTH] / counts[seen, SEEN_T1]  # T2|T1 of each participant
+        row = {'lag': condition[0]}
+        if byDistance:
+            row['distance'] = condition[1]
+        row.update({'participants': len(participants), 'trials': int(pooled[TRIALS]),
+                    'accuracyT1': ratio(pooled[SEEN_T1], pooled[TRIALS]),
+                    'accuracyT2givenT1': ratio(pooled[SEEN_BOTH], pooled[SEEN_T1]),
+                    'meanT2givenT1': means.mean() if len(means) else float('nan'),
+                    'seT2givenT1': means.std(ddof=1) / math.sqrt(len(means)) if len(means) > 1 else float('nan')})
+        rows.append(row)
+    return rows
+
+
+def writeTable(rows, path):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]) if rows else [], lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def printCurves(pooled):  # T2|T1 accuracy, lags as rows and distances as columns
+    lags = sorted({row['lag'] for row in pooled})
+    distances = sorted({row['distance'] for row in pooled})
+    cells = {(row['lag'], row['distance']): row for row in pooled}
+    print('T2|T1 accuracy (trials)')
+    print('lag (s) ' + ''.join('{0:>16}'.format('distance ' + str(distance)) for distance in distances))
+    for lag in lags:
+        line = '{0:<8.3f}'.format(lag)
+        for distance in distances:
+            row = cells.get((lag, distance))
+            line += '{0:>16}'.format('{0:.3f} ({1})'.format(row['accuracyT2givenT1'], row['trials']) if row else '-')
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help='results databases (.db) or .csv files')
+    parser.add_argument('--out', help='prefix of the .csv tables written')
+    parser.add_argument('--chunk', type=int, default=100000, help='trials read at a time')
+    options = parser.parse_args()
+
+    totals = countTrials(options.sources, options.chunk)
+    pooled = pooledTable(totals)
+    printCurves(pooled)
+    if options.out:
+        writeTable(participantTable(totals), options.out + '_participants.csv')
+        writeTable(pooled, options.out + '_pooled.csv')
+        writeTable(pooledTable(totals, byDistance=False), options.out + '_lags.csv')
@@ -0,0 +1,217 @@
+""" Microbenchmarks of the functions of FunModule called during every trial. They run against a stub of the ui object
+over a grid of numbers of streams and frames, and report the time and memory allocated per call.
+
+python Benchmark.py --save benchmark.json        measures and saves the results as a baseline
+python Benchmark.py --compare benchmark.json     measures and compares with a saved baseline
+"""
+
+import os
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')  # FunModule creates the Qt application when imported
+
+import argparse
+import functools
+import json
+import tempfile
+import timeit
+import tracemalloc
+from random import randint
+
+import numpy as np
+
+import FunModule
+from AdaptiveDesign import AdaptiveDesign
+from FunModule import createPoly
+from Layout import buildLayout
+from Schedule import buildSymbols
+from ResultsStore import ResultsStore
+from StimulusArchive import StimulusArchive, archivePath
+from TrialState import SessionState
+
+
+class StubWidget:  # stands for the labels, text boxes and buttons used by the functions
+    def __init__(self, text='', number=0):
+        self.string = text
+        self.number = number
+
+    def text(self):
+        return self.string
+
+    def setText(self, text):
+        self.string = text
+
+    def value(self):
+        return self.number
+
+    def setStyleSheet(self, style):
+        pass
+
+    def show(self):
+        pass
+
+    def hide(self):
+        pass
+
+    def isChecked(self):
+        return True
+
+    def currentText(self):
+        return 'University'
+
+
+class StubCanvas:
+    def showFrame(self, frame, frameNumber):
+        self.frame = frame
+
+    def clearFrame(self):
+        self.frame = None
+
+
+class StubUi:  # attributes set by RunExperiment and used by the benchmarked functions
+    def __init__(self, streams, framesMax, results, dataName):
+        self.streams = streams
+        self.framesMax = framesMax
+        self.radius = 180
+        self.interval = 140
+        self.trialMax = 7
+        self.practiceTrial = False
+        self.practiceNumber = 0
+        self.distractors = [chr(letter) for letter in range(65, 91)]
+        self.targets = list(range(2, 10))
+        self.symbols = buildSymbols(self.distractors, self.targets)
+        self.session = SessionState(framesMax, streams)
+        self.session.trialCount = 1
+        self.trial = self.session.trial
+        self.trial.shift = randint(0, 360)
+        self.layout = buildLayout(streams, self.radius, self.trial.shift)
+        self.canvas = StubCanvas()
+        self.entriesList = [StubWidget('2'), StubWidget('3')]
+        self.leName = StubWidget('name')
+        self.leEmail = StubWidget('name@mail')
+        self.sbAge = StubWidget(number=25)
+        self.rbtnWoman = StubWidget()
+        self.cbEducation = StubWidget()
+        self.results = results
+        self.stimulusArchive = StimulusArchive(archivePath(dataName, framesMax, streams), framesMax, streams,
+                                               self.symbols)
+        self.seed = 1
+        self.adaptiveDesign = False
+        self.targetWidth = 0.3
+        self.minCellTrials = 2
+        self.adaptive = None
+        FunModule.ui = self
+        FunModule.storeParticipant()
+        FunModule.startBlock(self.trialMax)
+        FunModule.pickTarget(self.trial)
+        FunModule.pickSchedule(self.trial)
+        FunModule.scoreAnswers()
+        FunModule.getDistance()
+
+
+def nextFrame():  # pickDistractors over and over, starting the stream again after the last frame
+    if FunModule.ui.trial.frameCount == FunModule.ui.framesMax:
+        FunModule.ui.trial.frameCount = 0
+    FunModule.pickDistractors()
+
+
+def nextTarget():  # pickTarget over and over, reading the design of the block again after the last trial
+    if FunModule.ui.session.designRow == len(FunModule.ui.session.design):
+        FunModule.ui.session.designRow = 0
+    FunModule.pickTarget(FunModule.ui.trial)
+
+
+def nextChoice(ui, design):  # adaptive choice of the next trial over and over, starting the block again after the last
+    if ui.adaptive is None or len(ui.adaptive.chosen) == len(design):
+        ui.adaptive = AdaptiveDesign(ui.streams, ui.targets, ui.targetWidth, np.random.default_rng())
+    row = len(ui.adaptive.chosen)
+    ui.adaptive.choose(design, row)
+    ui.adaptive.record(row, (1, row % 2))  # answered before the trial after next is chosen, as in the experiment
+
+
+def benchmarks(ui):  # functions measured, called without arguments
+    return {'pickDistractors': nextFrame,
+            'startBlock': lambda: FunModule.startBlock(ui.trialMax),
+            'pickTarget': nextTarget,
+            'adaptiveChoose': functools.partial(nextChoice, ui, np.zeros((1000, 7), dtype=np.int16)),
+            'pickSchedule': lambda: FunModule.pickSchedule(ui.trial),
+            'createPoly': lambda: createPoly(ui.streams, ui.radius, ui.trial.shift),
+            'buildLayout': lambda: buildLayout(ui.streams, ui.radius, randint(0, 360)),
+            'getDistance': FunModule.getDistance,
+            'scoreAnswers': FunModule.scoreAnswers,
+            'checkAnswer': FunModule.checkAnswer,
+            'storeData': FunModule.storeData,
+            'storeStimuli': FunModule.storeStimuli}
+
+
+def measure(function, repeat):  # best time per call (us), and peak and retained memory per call (bytes)
+    number = 1
+    while timeit.timeit(function, number=number) < 0.02:  # enough calls for a measurable duration
+        number *= 2
+    seconds = min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+    tracemalloc.start()
+    function()  # first call outside the measure, caches are filled
+    peaks = []
+    start = tracemalloc.get_traced_memory()[0]
+    for i in range(100):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        function()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    retained = (tracemalloc.get_traced_memory()[0] - start) / 100
+    tracemalloc.stop()
+    return {'us': seconds * 1e6, 'peakBytes': sorted(peaks)[len(peaks)//2], 'retainedBytes': retained}
+
+
+def run(streamsGrid, framesGrid, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        store = ResultsStore(os.path.join(folder, 'benchmark.db'))  # trials are queued as in the experiment
+        for streams in streamsGrid:
+            for framesMax in framesGrid:
+                ui = StubUi(streams, framesMax, store, os.path.join(folder, 'benchmark'))
+                for name, function in benchmarks(ui).items():
+                    key = '{0} streams={1} frames={2}'.format(name, streams, framesMax)
+                    results[key] = measure(function, repeat)
+                    line = '{0:<45} {1:>10.2f} us {2:>9} B peak {3:>9.1f} B retained'
+                    print(line.format(key, results[key]['us'], results[key]['peakBytes'],
+                                      results[key]['retainedBytes']))
+                ui.stimulusArchive.close()
+        store.close()
+    return results
+
+
+def compare(results, baseline, tolerance):  # prints the change of time per call, returns the regressions
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result['us'] / baseline[key]['us']
+        flag = ''
+        if ratio > tolerance:
+            flag = '  SLOWER'
+            regressions.append(key)
+        print('{0:<45} {1:>10.2f} us -> {2:>10.2f} us  x{3:.2f}{4}'.format(key, baseline[key]['us'], result['us'],
+                                                                       ratio, flag))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--streams', type=int, nargs='+', default=[7, 16, 32, 64])
+    parser.add_argument('--frames', type=int, nargs='+', default=[30, 100, 300, 1000])
+    parser.add_argument('--repeat', type=int, default=5, help='repetitions, the best one is kept')
+    parser.add_argument('--save', help='save the results to this file')
+    parser.add_argument('--compare', help='compare the results with this saved baseline')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='slowdown ratio reported as a regression')
+    options = parser.parse_args()
+
+    results = run(options.streams, options.frames, options.repeat)
+    if options.save:
+        with open(options.save, 'w') as file:
+            json.dump(results, file, indent=1)
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)
+        print()
+        if compare(results, baseline, options.tolerance):
+            raise SystemExit(1)
@@ -0,0 +1,48 @@
+""" This module draws the design of a block before it starts: one row per trial, crossing every lag between the targets
+with every distance between their streams. The cells are shuffled and all of them are used once before any is repeated,
+so every condition gets the same number of trials and starting a trial only means reading the next row."""
+
+import numpy as np
+
+from Schedule import defaultRng
+
+# columns of a design
+LAG, DISTANCE, FRAME_T1, STREAM_T1, STREAM_T2, T1, T2 = range(7)
+
+LAGS = range(1, 7)  # difference between T1 and T2 in frames
+FIRST_FRAME, LAST_FRAME = 10, 25  # frames T1 and T2 can appear on
+
+
+def designCells(streams, lags=LAGS):  # every (lag, distance) condition, distance in sides counted around the polygon
+    distances = range(streams//2 + 1)
+    return np.array([(lag, distance) for lag in lags for distance in distances], dtype=np.int16)
+
+
+def buildDesign(trials, streams, targets, lags=LAGS, firstFrame=FIRST_FRAME, lastFrame=LAST_FRAME, rng=None):
+    """ Returns a trials x 7 int16 array of the conditions of a block, in the order they are presented. T1 appears
+    between firstFrame and lastFrame - lag so that T2 never goes past lastFrame, whatever the lag."""
+    if rng is None:
+        rng = defaultRng
+    cells = designCells(streams, lags)
+    repeats = -(-trials // len(cells))  # complete replications of the grid, the last one is cut short
+    order = np.concatenate([rng.permutation(len(cells)) for repeat in range(repeats)])[:trials]
+
+    design = np.empty((trials, 7), dtype=np.int16)
+    design[:, LAG] = cells[order, 0]
+    design[:, DISTANCE] = cells[order, 1]
+    fillConditions(design, streams, targets, firstFrame, lastFrame, rng)
+    return design
+
+
+def fillConditions(design, streams, targets, firstFrame=FIRST_FRAME, lastFrame=LAST_FRAME, rng=None):
+    """ Draws the frame of T1, the streams of the targets and the two digits of design rows whose lag and distance
+    are set, e.g. a single row chosen by AdaptiveDesign."""
+    if rng is None:
+        rng = defaultRng
+    trials = len(design)
+    design[:, FRAME_T1] = rng.integers(firstFrame, lastFrame - design[:, LAG] + 1)
+    design[:, STREAM_T1] = rng.integers(0, streams, trials)
+    side = rng.choice([-1, 1], trials)  # T2 clockwise or anticlockwise from T1
+    design[:, STREAM_T2] = (design[:, STREAM_T1] + side * design[:, DISTANCE]) % streams
+    digits = np.argsort(rng.random((trials, len(targets))), axis=1)[:, :2]  # two different digits per trial
+    design[:, [T1, T2]] = np.asarray(targets)[digits]
@@ -0,0 +1,47 @@
+""" This module contains the timer presenting the frames of a trial. Every frame has an absolute deadline measured from
+the start of the stream on a monotonic clock, so a late frame delays neither the next ones nor the T1-T2 lag."""
+
+from PyQt5.QtCore import *
+from time import perf_counter_ns
+
+
+class FrameScheduler(QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)            # re-armed after every frame with the time left to the deadline
+        self.timer.setTimerType(Qt.PreciseTimer)  # millisecond accuracy instead of the 5% slack of coarse timers
+        self.timer.timeout.connect(self.tick)
+        self.running = False
+        self.callback = None
+        self.frame = 0       # number of frames presented since start
+        self.origin = 0      # clock time (ns) the frame deadlines are counted from
+        self.period = 0      # time between frames (ns)
+
+    def start(self, interval, callback):  # calls callback every interval (ms), the first time one interval from now
+        self.period = interval * 1000000
+        self.callback = callback
+        self.frame = 0
+        self.running = True
+        self.origin = perf_counter_ns()
+        self.arm()
+
+    def stop(self):
+        self.running = False
+        self.timer.stop()
+
+    def deadline(self, frame):  # clock time (ns) at which a frame is due
+        return self.origin + frame * self.period
+
+    def untilNext(self):  # time (ms) left before the deadline of the next frame, 0 if it has already passed
+        remaining = self.deadline(self.frame + 1) - perf_counter_ns()
+        return max(0, round(remaining / 1000000))
+
+    def arm(self):  # waits until the deadline of the next frame
+        self.timer.start(self.untilNext())
+
+    def tick(self):
+        self.frame += 1
+        self.callback()
+        if self.running:  # the callback may have stopped the stream
+            self.arm()
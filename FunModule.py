@@ -2,34 +2,45 @@
 
 from uiStuff import *
 from random import *
+from Schedule import *
+from TrialState import *
+from Design import FIRST_FRAME, LAST_FRAME, LAGS, buildDesign
+from Layout import buildLayout
+from AdaptiveDesign import AdaptiveDesign
+from TrialPipeline import *
+import gc
+import numpy as np
+import json
 import math
 import time
 
 
+def showPage(index):  # pages are built when first shown, and the next one too so that it is ready when needed
+    ui.buildPages(index + 1)
+    ui.swPages.setCurrentIndex(index)
+
+
 def nextPage():  # incrementally increases page number
     currentPage = ui.swPages.currentIndex()
-    ui.swPages.setCurrentIndex(currentPage + 1)
+    showPage(currentPage + 1)
 
 
 def labelHide():  # hide all streams before experiment begins
-    for label in ui.labelsList:
-        label.hide()
+    ui.canvas.clearFrame()
 
 
-def delayTimer(milliseconds, change):  # call a function after a custom delay period
-    ui.oneTimer = QTimer()
-    ui.oneTimer.singleShot(milliseconds, change)
+def delayTimer(milliseconds, change):  # call a function after a custom delay period, scaled in simulations
+    ui.pipeline.after(milliseconds, change)  # cancellable, see TrialPipeline.py
 
 
 def createPoly(n, r, s):  # creates list with coordinates for a polygon of n sides, radius r and shift s
-    coordinates = []               # adapted from https://stackoverflow.com/questions/35316781/drawing-a-polygon-in-pyqt
-    w = 360/n                      # angle per step
-    for i in range(n):
-        t = w*i + s
-        x = r*math.cos(math.radians(t))
-        y = r*math.sin(math.radians(t))
-        coordinates.append([y, x])  # stores x and y coordinates in a list of lists
-    return coordinates
+    return buildLayout(n, r, s).vertices.tolist()  # geometry is computed once per rotation, see Layout.py
+
+
+def showAnswerPage():  # flips to the answer page and records when it appeared
+    nextPage()  # its onset is stamped when the keyboard widget is first painted on it
+    ui.pipeline.enter(RESPONSE)
+    delayTimer(0, prepareTrial)  # once the page is on screen, the next trial is drawn while the participant answers
 
 
 def consentCheck():  # displays error message if terms and conditions aren't accepted
@@ -48,6 +59,7 @@ def errorCheck():  # displays specific error message for each field in the form
         demogCount += 1
 
     if ui.sbAge.value() == 0:
+        ui.lblErrorAge.setText(ui.errorTexts[ui.lblErrorAge])
         ui.lblErrorAge.show()
     elif ui.sbAge.value() < 18:
         ui.lblErrorAge.setText("You must be at least 18 years old")
@@ -69,6 +81,7 @@ def errorCheck():  # displays specific error message for each field in the form
         demogCount += 1
 
     if ui.leEmail.text() == "":
+        ui.lblErrorEmail.setText(ui.errorTexts[ui.lblErrorEmail])
         ui.lblErrorEmail.show()
     elif '@' not in ui.leEmail.text():
         ui.lblErrorEmail.setText("Please enter a valid email address")
@@ -80,147 +93,196 @@ def errorCheck():  # displays specific error message for each field in the form
     window.repaint()  # mac issue
 
     if demogCount == 5:  # counter makes sure all fields are filled and accepted
+        storeParticipant()
         nextPage()
 
 
-def pickTarget():  # picks targets and assigns frame numbers
-    ui.targetsChosen = []               # empty out list of chosen targets (for checking answers later on)
-    ui.targetList = ui.targets.copy()   # create a copy of the original stimuli list otherwise it also becomes modified
-    ui.T1 = choice(ui.targetList)
-    ui.targetsChosen.append(ui.T1)
-    ui.targetList.remove(ui.T1)         # deletes chosen item so targets are different
-    ui.T2 = choice(ui.targetList)
-    ui.targetsChosen.append(ui.T2)
+def startBlock(trials, rng=None):  # draws the balanced conditions of a block of trials before it starts
+    ui.session.startBlock(buildDesign(trials, ui.streams, ui.targets, rng=rng))
 
-    framesT1List = list(range(10,25))   # digits were only presented from frame 13-25
-    ui.frameT1 = choice(framesT1List)
-    ui.frameT2 = ui.frameT1 + randint(1,6)      # difference between T1 and T2 limited to 1-6frames
-    if ui.frameT2 > 25:                 # cannot go above frame 25
-        ui.frameT2 = 25
 
-    ui.diffFrame = ui.frameT2 - ui.frameT1  # calculate frame difference in order to sample
+def startAdaptiveBlock(rng):  # conditions of the block chosen trial by trial, from the answers (see AdaptiveDesign.py)
+    ui.adaptive = AdaptiveDesign(ui.streams, ui.targets, ui.targetWidth, rng, minTrials=ui.minCellTrials)
+    ui.session.startBlock(np.zeros((ui.trialMax, 7), dtype=np.int16))
 
-    if len(ui.lagList) == 6:  # empty list of frame differences when all possibilities have been sampled
-        ui.lagList = []
 
-    if ui.diffFrame in ui.lagList:  # chooses frames again (limited to 13-25, so if T1 is 24 T2 can only be 25)
-        pickTarget()
-    else:
-        ui.lagList.append(ui.diffFrame)
-
-
-def showTarget():  # displays target numbers on a randomly selected frame and position
-    if ui.frameCount == ui.frameT1:
-        ui.labelT1 = choice(ui.labelsList)
-        ui.index1 = ui.labelsList.index(ui.labelT1)
-        ui.labelT1.setText(str(ui.T1))
-        ui.labelT1.setStyleSheet('color: white')  # brightness of targets is higher than distractors
-    elif ui.frameCount == ui.frameT2:
-        ui.diffPosition = randint(0,len(ui.labelsList))  # randomise position by choosing an index
-        if len(ui.positionList) == len(ui.labelsList):  # if all the positions have been sampled, empty list, start over
-            ui.positionList = []
-
-        ui.positionList.append(ui.diffPosition)
-        ui.index2 = ui.index1 + ui.diffPosition
-
-        if ui.index2 > len(ui.labelsList)-1:  # if index becomes out of range, start counting from 0 again
-            ui.index2 = ui.index2 - len(ui.labelsList)-1
-
-        ui.labelT2 = ui.labelsList[ui.index2]
-        ui.labelT2.setText(str(ui.T2))
-        ui.labelT2.setStyleSheet('color: white')
-
-
-def pickDistractors():  # (iterations, list), randomly selects letter from alphabet as a distractor stimulus
-    ui.frameCount += 1
-    ui.distractorList = ui.distractors.copy()  # create a copy of the original list otherwise it also becomes modified
-
-    for i in range(ui.streams):  # randomly selects letter from alphabet for each stream
-        distractor = choice(ui.distractorList)
-        if ui.frameCount > 1:
-            while distractor == ui.previousList[(ui.frameCount-2) * ui.streams + i]:  # cant be in the same position 2x
-                distractor = choice(ui.distractorList)
-        ui.labelsList[i].setText(distractor)
-        ui.labelsList[i].setStyleSheet('color: lightGray')
-        ui.labelsList[i].show()
-        labelGeometry = QRect(ui.pageCentreWidth + ui.vertices[i][0] - ui.lblWidth/2,
-                              ui.pageHeight/2 - ui.vertices[i][1] - ui.lblHeight/2, ui.lblWidth, ui.lblHeight)
-        ui.labelsList[i].setGeometry(labelGeometry)  # applying the equidistant geometry
-        ui.previousList.append(distractor)
-        ui.distractorList.remove(distractor)
+def pickTarget(trial):  # targets, their frames and their streams, read from the next row of the design
+    takeTrial(trial, ui.session)
+
+
+def pickSchedule(trial, rng=None):  # precomputes the symbols of every frame and stream of the trial, targets included
+    codeT1 = targetCode(trial.T1, ui.distractors, ui.targets)
+    codeT2 = targetCode(trial.T2, ui.distractors, ui.targets)
+    fillSchedule(trial, len(ui.distractors), codeT1, codeT2, rng)
+
+
+def prepareTrial():  # draws the next trial into the spare trial state, nothing to do if it is ready or none is left
+    session = ui.session
+    if session.prepared or session.trialCount >= totalTrials():
+        return
+    trial = session.nextTrial
+    trial.reset()
+    mainStart = ui.practiceNumber if isPracticeBlock() else 0  # trials before the main block
+    if session.trialCount == 0 and isPracticeBlock():
+        startBlock(ui.practiceNumber, blockRng(session.seed, PRACTICE_BLOCK))
+    elif session.trialCount == mainStart:
+        if ui.adaptiveDesign:
+            startAdaptiveBlock(blockRng(session.seed, MAIN_BLOCK))
+        else:
+            startBlock(ui.trialMax, blockRng(session.seed, MAIN_BLOCK))
+    if ui.adaptive and session.trialCount >= mainStart:
+        ui.adaptive.choose(session.design, session.designRow)  # well under a millisecond, see Benchmark.py
+    rng = trialRng(session.seed, session.trialCount + 1)  # the trial can be drawn again from the seed, see Replay.py
+    # List of equidistant labels positioned in a circle around the fixation point
+    trial.shift = drawShift(rng)  # selects random integer, representing shift degree
+    trial.layout = buildLayout(ui.streams, ui.radius, trial.shift)  # number of sides, radius, and angle of rotation
+    pickTarget(trial)
+    pickSchedule(trial, rng)
+    session.prepared = True
+
+
+def pickDistractors():  # displays the symbols of the current frame, looked up in the trial schedule
+    trial = ui.trial
+    trial.frameCount += 1
+    ui.canvas.showFrame(trial.schedule[trial.frameCount-1], trial.frameCount)  # targets are drawn brighter
 
 
 def getDistance():  # Calculates distance in terms of number of sides between T1 and T2 and absolute distance in units
-    indexT1 = ui.labelsList.index(ui.labelT1)
-    indexT2 = ui.labelsList.index(ui.labelT2)
-    if indexT1 < indexT2:
-        diffIndex = indexT2 - indexT1
-        diffAdjust = indexT2 +ui.streams -indexT1
-        listIndex = [diffIndex,diffAdjust]
-        ui.distanceIndex = min(listIndex)
-    else:
-        diffIndex = indexT1 - indexT2
-        diffAdjust = indexT1 + ui.streams - indexT2
-        listIndex = [diffIndex, diffAdjust]
-        ui.distanceIndex = min(listIndex)  # actual distance (in sides) once circularity and symmetry taken into account
-    ui.distanceUnits = ui.lengths[ui.distanceIndex]  # fetches previously calculated distance in pyqt units
+    measureDistance(ui.trial, ui.layout)
 
 
 def endTrial():  # stops showing stimuli once sequence of frames is over
-    if ui.frameCount == ui.framesMax:
-        ui.framesTimer.stop()
-        delayTimer(ui.interval, labelHide)  # back to fixation cross
-        delayTimer(1500, nextPage)          # flip to answer page
-        ui.time1 = time.time()
+    if ui.trial.frameCount == ui.framesMax:
+        ui.frameScheduler.stop()
+        gc.enable()  # collections may happen again, the stream is over
+        ui.pipeline.at(ui.frameScheduler.untilNext(), labelHide)  # fixation cross one frame later, time already scaled
+        delayTimer(1500, showAnswerPage)    # flip to answer page
         ui.myWidget.show()
         ui.myWidget.setFocus()  # reset focus whenever answer page is displayed otherwise keyPressEvent won’t be called
         getDistance()
 
 
-def startTrial():  # reset counters for frames, pick digits again in new trial
-    ui.positionList = []  # empty out list of positions otherwise run out of memory
-    # List of equidistant labels positioned in a circle around the fixation point
-    ui.shift = randint(0, 360)  # selects random float, representing shift degree
-    ui.vertices = createPoly(ui.streams, ui.radius, ui.shift)  # choose number of sides, radius, and angle of rotation
+def startTrial():  # switch to the trial drawn during the previous answer page, and start its fixation period
+    prepareTrial()  # first trial, the others are already prepared
+    ui.session.swapTrials()
+    ui.trial = ui.session.trial
+    ui.layout = ui.trial.layout
+    ui.canvas.setPositions(ui.layout.vertices, ui.pageCentreWidth, ui.pageHeight/2)
 
-    if ui.practiceTrial is True and ui.trialCount < ui.practiceNumber:  # indicates if the trial is a practice one
+    if ui.session.trialCount == 0:
+        reportStartup()
+    if ui.practiceTrial is True and ui.session.trialCount < ui.practiceNumber:  # practice trial
         ui.lblPractice.show()
         ui.lblPractice2.show()
     else:
         ui.lblPractice.hide()
         ui.lblPractice2.hide()
-    pickTarget()
-    ui.frameCount = 0
-    ui.trialCount += 1
-    ui.answerCount = 0
+    ui.session.trialCount += 1
+    ui.timingLog.startTrial(ui.session.trialCount, isPractice(), ui.trial.frameT1, ui.trial.frameT2)
+    ui.session.answerCount = 0
     ui.lblEntry1.hide()
     ui.lblEntry2.hide()
+    ui.pipeline.enter(FIXATION)
+    delayTimer(0, collectGarbage)  # nothing is timed during the fixation period
     delayTimer(1000, showStimuli)
 
 
+def reportStartup():  # how long the participant waited for the experiment, written once to the timing report
+    if 'first trial' not in ui.startup.marks:
+        ui.startup.mark('first trial')
+        ui.timingReport.write(ui.startup.report(ui))
+
+
+def showFrame():  # everything happening on a frame, in order
+    pickDistractors()  # changes letters each frame
+    endTrial()  # checks if max frame has been reached
+
+
+def collectGarbage():  # collects between trials what would otherwise be collected during a stream
+    if ui.quietGc:
+        gc.collect(1)  # objects of the last trials, a full collection would walk all of Qt and NumPy every trial
+
+
+def freezeHeap():  # full collection once the pages are built and between participants, not during their trials
+    if ui.quietGc:
+        gc.unfreeze()  # what the last participant left behind is collected too
+        gc.collect()
+        gc.freeze()    # what is left lives until the end, and is not scanned again
+
+
 def showStimuli():
-    ui.framesTimer = QTimer()
-    ui.framesTimer.start(ui.interval)
-    ui.framesTimer.timeout.connect(pickDistractors)  # changes letters each frame
-    ui.framesTimer.timeout.connect(endTrial)  # checks if max frame has been reached
-    ui.framesTimer.timeout.connect(showTarget)
+    ui.pipeline.enter(STIMULI)
+    if ui.quietGc:  # no garbage collection pause can delay a frame, until endTrial
+        gc.disable()
+    ui.frameScheduler.start(ui.interval * ui.timeScale, showFrame)  # frames keep to their deadlines even if one is late
+    ui.timingLog.startStream(ui.frameScheduler.origin)
 
 
 def newTrial():  # essentially loops over experiment until trial number has been reached
-    if ui.practiceTrial is True:
-        if ui.trialCount - ui.practiceNumber < ui.trialMax:
+    if ui.adaptive and ui.adaptive.done():  # every condition is estimated precisely enough, the block stops early
+        endSession()
+    elif ui.practiceTrial is True:
+        if ui.session.trialCount - ui.practiceNumber < ui.trialMax:
             labelHide()
-            ui.swPages.setCurrentIndex(3)
+            showPage(3)
             startTrial()  # automatically starts without needing to press buttons
         else:
-            ui.swPages.setCurrentIndex(5)
+            endSession()
     else:
-        if ui.trialCount < ui.trialMax:  # displays stimuli until previously defined number of trials
+        if ui.session.trialCount < ui.trialMax:  # displays stimuli until previously defined number of trials
             labelHide()
-            ui.swPages.setCurrentIndex(3)
+            showPage(3)
             startTrial()  # automatically starts without needing to press buttons
         else:
-            ui.swPages.setCurrentIndex(5)
+            endSession()
+
+
+def endSession():  # debrief page, and summary of the frame timing of the session
+    ui.pipeline.cancel()
+    gc.enable()  # in case the session stopped during a stream
+    showPage(5)
+    report = ui.timingLog.report() + (ui.watchdog.report() if ui.watchdog else '')
+    ui.timingReport.write('{0} {1}\n{2}\n'.format(time.strftime('%Y-%m-%d %H:%M:%S'), ui.leName.text(), report))
+    ui.timingReport.flush()
+    ui.results.sync()  # end of the block, the results reach the disk
+    ui.timingData.sync()
+    ui.stimulusArchive.sync()
+    if ui.kiosk:  # the same process waits for the next participant
+        delayTimer(ui.debriefTime, resetSession)
+
+
+def clearForm():  # consent and demographics back to blank, as the next participant should find them
+    ui.chbAgree.setChecked(False)
+    ui.leName.clear()
+    ui.sbAge.setValue(0)
+    ui.cbEducation.setCurrentIndex(0)
+    for button in (ui.rbtnWoman, ui.rbtnMan, ui.rbtnOther):  # exclusive buttons cannot be unchecked otherwise
+        button.setAutoExclusive(False)
+        button.setChecked(False)
+        button.setAutoExclusive(True)
+    ui.leEmail.clear()
+    for label in (ui.lblError0, ui.lblErrorName, ui.lblErrorGender, ui.lblErrorEduc, ui.lblErrorAge, ui.lblErrorEmail):
+        label.hide()
+    for label, text in ui.errorTexts.items():  # errorCheck may have changed them for the last participant
+        label.setText(text)
+
+
+def resetSession():  # kiosk mode: back to the consent page, keeping the window, the canvas and the open results files
+    ui.pipeline.cancel()
+    ui.frameScheduler.stop()
+    ui.session.reset()  # counters, design and both trial states, see TrialState.py
+    ui.trial = ui.session.trial
+    ui.timingLog.reset()
+    ui.adaptive = None
+    if ui.watchdog:
+        ui.watchdog.reset()
+    clearForm()
+    labelHide()
+    for label in ui.entriesList + [ui.lblErrorDigit, ui.lblPractice, ui.lblPractice2]:
+        label.hide()
+    ui.myWidget.hide()
+    showPage(0)
+    freezeHeap()
 
 
 def showAnswer(key, index):  # displays answer on screen
@@ -228,42 +290,70 @@ def showAnswer(key, index):  # displays answer on screen
     labelAnswer.setStyleSheet("color: black")
     labelAnswer.setText(key)
     labelAnswer.show()
+    ui.trial.answers[index] = key
     if index == 1:
+        ui.pipeline.enter(FEEDBACK)
         delayTimer(1000,checkAnswer)  # did not want immediate feedback to prevent distractions
         delayTimer(3000, newTrial)
 
 
+def scoreAnswers():  # stores accuracy of answers, correct = 1 and incorrect = 0
+    scoreTrial(ui.trial)
+
+
 def checkAnswer():  # provides feedback on correct/incorrect
-    ui.outcomeList = []  # stores accuracy of answers
-    for answer in ui.entriesList:
-        index = ui.entriesList.index(answer)
-        if answer.text() == str(ui.targetsChosen[index]):
-            ui.outcomeList.append(1)  # correct = 1
-            answer.setStyleSheet("color: green")
+    for index in range(len(ui.entriesList)):
+        if ui.trial.outcomes[index] == 1:
+            ui.entriesList[index].setStyleSheet("color: green")
         else:
-            ui.outcomeList.append(0)  # incorrect = 0
-            answer.setStyleSheet("color:red")
+            ui.entriesList[index].setStyleSheet("color:red")
 
 
-def getAnswer(key):  # obtains identity of key pressed, and link it to functions
+def getAnswer(key, pressed):  # obtains identity of key pressed, and when (perf_counter_ns), and link it to functions
     if not key.isdigit():
         ui.lblErrorDigit.show()
     else:
         ui.lblErrorDigit.hide()
-        ui.answerCount += 1           # prevent proceeding onto next step if key pressed != integer
-        ui.time2 = time.time()
-        if ui.answerCount == 1:
+        ui.session.answerCount += 1           # prevent proceeding onto next step if key pressed != integer
+        if ui.session.answerCount <= 2:
+            index = ui.session.answerCount - 1
+            ui.timingLog.stampResponse(index, pressed)
+            ui.trial.responseTimes[index] = ui.timingLog.responseTime(index)
+        if ui.session.answerCount == 1:
             showAnswer(key, 0)
-        elif ui.answerCount == 2:
+        elif ui.session.answerCount == 2:
             showAnswer(key, 1)
             ui.myWidget.hide()  # take away focus so the button can be clicked
-            if (ui.practiceTrial is True) and (ui.trialCount <= ui.practiceNumber):
+            scoreAnswers()  # scored straight away, feedback is only shown later
+            storeStimuli()
+            if isPractice():
                 pass
             else:
                 storeData()
+                if ui.adaptive:  # the next trial may be drawn already, its row is not the one answered
+                    ui.adaptive.record(mainTrialNo() - 1, ui.trial.outcomes)
+            ui.timingLog.endTrial()  # frame onsets of every trial, practice included, go to the sidecar file
+
+
+def isPracticeBlock():  # True if the session starts with practice trials
+    return ui.practiceTrial is True and ui.practiceNumber > 0
+
 
+def totalTrials():  # practice and experimental trials of the session
+    return ui.trialMax + ui.practiceNumber if ui.practiceTrial is True else ui.trialMax
 
-def storeData():  # stores variables in a list per participant every trial
+
+def mainTrialNo():  # number of the current trial in the main block, from 1
+    if ui.practiceTrial is True:
+        return ui.session.trialCount-ui.practiceNumber
+    return ui.session.trialCount
+
+
+def isPractice():  # True during practice trials, whose results are not recorded
+    return (ui.practiceTrial is True) and (ui.session.trialCount <= ui.practiceNumber)
+
+
+def storeParticipant():  # stores the participant once, their trials refer to them
     ui.name = ui.leName.text()
     ui.age = ui.sbAge.value()
     ui.education = ui.cbEducation.currentText()
@@ -272,17 +362,87 @@ def storeData():  # stores variables in a list per participant every trial
         ui.gender = 0
     else:
         ui.gender = 1
-    ui.diffTime = (ui.diffFrame * ui.interval)/1000  # convert frame to timer difference in seconds
-
-    ui.result1 = ui.outcomeList[0]
-    ui.result2 = ui.outcomeList[1]
-    if ui.practiceTrial is True:
-        ui.trialNo = ui.trialCount-ui.practiceNumber
-    ui.dataList = [ui.name, str(ui.age), str(ui.gender), ui.education, ui.email, str(ui.trialNo), str(ui.diffTime),
-                   str(ui.distanceIndex), str(ui.distanceUnits), str(ui.result1), str(ui.result2)]
-    writeCsv()
-
-
-def writeCsv():  # writes new line for each participant
-    newLine = ','.join(ui.dataList)
-    ui.data.write(newLine + '\n')
+    ui.session.seed = ui.seed if ui.seed is not None else newSeed()  # every stimulus of the session follows from it
+    ui.results.addParticipant(ui.name, ui.age, ui.gender, ui.education, ui.email, ui.session.seed,
+                              json.dumps(sessionConfig()))
+    ui.stimulusArchive.startSession(ui.session.seed)
+
+
+def sessionConfig():  # everything the stimuli depend on besides the seed, stored with the participant for Replay.py
+    return {'streams': ui.streams, 'radius': ui.radius, 'interval': ui.interval, 'framesMax': ui.framesMax,
+            'trialMax': ui.trialMax, 'practiceTrial': ui.practiceTrial, 'practiceNumber': ui.practiceNumber,
+            'distractors': [str(distractor) for distractor in ui.distractors], 'targets': list(ui.targets),
+            'lags': list(LAGS), 'firstFrame': FIRST_FRAME, 'lastFrame': LAST_FRAME, 'adaptive': ui.adaptiveDesign,
+            'targetWidth': ui.targetWidth, 'minCellTrials': ui.minCellTrials}
+
+
+def storeData():  # stores the variables of every trial, queued to the writer thread of the database
+    trial = ui.trial
+    diffTime = (trial.diffFrame * ui.interval)/1000  # convert frame to timer difference in seconds
+    trialNo = mainTrialNo()
+    rt1, rt2 = [None if math.isnan(rt) else round(float(rt), 3) for rt in trial.responseTimes]  # NULL if unknown
+    ui.results.addTrial(trialNo, diffTime, trial.distanceIndex, trial.distanceUnits, int(trial.outcomes[0]),
+                        int(trial.outcomes[1]), rt1, rt2)
+
+
+def storeStimuli():  # archives what every stream showed on every frame of the trial, practice included
+    ui.stimulusArchive.addTrial(ui.trial, ui.session.trialCount, mainTrialNo(), isPractice())
+
+
+def closeFiles():  # waits for the results files to be written and synced
+    ui.results.close()
+    ui.stimulusArchive.close()
+    ui.timingData.close()
+    ui.timingReport.close()
+
+
+def fillForm(name):  # consent and demographics filled in for a synthetic participant
+    ui.chbAgree.setChecked(True)
+    consentCheck()
+    ui.leName.setText(name)
+    ui.sbAge.setValue(25)
+    ui.cbEducation.setCurrentIndex(4)
+    ui.rbtnOther.setChecked(True)
+    ui.leEmail.setText(name + '@simulation')
+    errorCheck()
+
+
+def simulateAnswer():  # the synthetic participant types both digits as soon as the answer page appears
+    trial = ui.trial
+    answers = ui.observer.respond(trial.T1, trial.T2, trial.diffFrame, trial.distanceIndex, ui.targets)
+    for key in answers:
+        ui.myWidget.keyPressed.emit(key, time.perf_counter_ns())
+
+
+def simulateReading():  # the synthetic participant answers once the answer page is on screen
+    if ui.swPages.currentIndex() == 4 and ui.session.answerCount == 0:
+        QTimer.singleShot(0, simulateAnswer)
+
+
+def simulatePage(index):  # follows the pages of the experiment on behalf of the synthetic participant
+    if index == 0:  # kiosk mode, the next participant arrives
+        QTimer.singleShot(0, simulateParticipant)
+    elif index == 5:
+        ui.simulationTime = time.perf_counter() - ui.simulationStart
+        print('{0} trials simulated in {1:.2f} s'.format(ui.session.trialCount, ui.simulationTime))
+        if ui.simulated == 1:
+            print(ui.startup.report(ui), end='')
+        if not ui.kiosk or ui.simulated >= ui.participants:
+            app.quit()
+
+
+def simulateParticipant():  # consent, demographics and instructions, then the experiment starts
+    ui.simulated += 1
+    ui.simulationStart = time.perf_counter()
+    fillForm(ui.simulationName + (str(ui.simulated) if ui.simulated > 1 else ''))
+    ui.btnNext.click()  # instructions read
+
+
+def startSimulation(observer, participants=1, name='simulation'):  # runs the experiment with synthetic participants
+    ui.observer = observer
+    ui.participants = participants  # one after the other in kiosk mode
+    ui.simulated = 0
+    ui.simulationName = name
+    ui.swPages.currentChanged.connect(simulatePage)
+    ui.onBuild(4, lambda: ui.myWidget.painted.connect(simulateReading))  # once the answer page is built
+    simulateParticipant()
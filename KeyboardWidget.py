@@ -0,0 +1,40 @@
+""" This module contains the widget receiving the digits typed on the answer page. A key press is timed with the
+timestamp of its event, converted to the perf_counter clock of the frame onsets, so that its response time does not
+include the time the event waited in the queue. The first paint of the widget tells when the answer page appeared."""
+
+from PyQt5.QtCore import *
+from PyQt5.QtWidgets import QWidget
+from time import perf_counter_ns
+
+
+class EventClock:  # converts event timestamps (ms, clock of the window system) to perf_counter_ns
+    def __init__(self):
+        self.offset = None  # smallest handling time minus event time seen, the event that waited least in the queue
+        self.last = 0
+
+    def convert(self, timestamp, handled):  # clock time (ns) of an event handled at perf_counter_ns() = handled
+        if timestamp == 0:  # platforms which do not stamp their events, the handling time is the best we have
+            return handled
+        eventNs = timestamp * 1000000
+        if self.offset is None or timestamp < self.last:  # first event, or the 32-bit millisecond clock wrapped
+            self.offset = handled - eventNs
+        else:
+            self.offset = min(self.offset, handled - eventNs)
+        self.last = timestamp
+        return eventNs + self.offset
+
+
+class KeyboardWidget(QWidget):
+    keyPressed = pyqtSignal(str, object)  # text of the key, clock time (ns) it was pressed
+    painted = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.clock = EventClock()
+
+    def keyPressEvent(self, keyEvent):
+        handled = perf_counter_ns()
+        self.keyPressed.emit(keyEvent.text(), self.clock.convert(keyEvent.timestamp(), handled))
+
+    def paintEvent(self, event):  # the answer page is on screen
+        self.painted.emit()
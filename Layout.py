@@ -0,0 +1,60 @@
+""" This module computes where the streams are drawn: the vertices of a polygon around the fixation point, or of several
+concentric polygons (rings) at different eccentricities, and the distances between every pair of streams. Layouts are
+cached per rotation, and the distance tables do not depend on the rotation, so they are only computed once per set of
+rings. Finding the distance between two streams is then a table lookup."""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+class Layout:  # geometry of the streams for one rotation, streams of the inner ring first
+    __slots__ = ['rings', 'shift', 'vertices', 'ring', 'steps', 'distances']
+
+    def __init__(self, rings, shift, vertices, ring, steps, distances):
+        self.rings = rings          # (streams, radius) of every ring
+        self.shift = shift          # rotation (degrees)
+        self.vertices = vertices    # streams x 2 positions, [r sin, r cos] as in createPoly
+        self.ring = ring            # ring of every stream
+        self.steps = steps          # streams x streams sides between streams of a same ring, -1 across rings
+        self.distances = distances  # streams x streams Euclidean distances, in ui units
+
+    @property
+    def streams(self):
+        return len(self.vertices)
+
+
+def ringVertices(streams, radius, shift):  # vertices of one polygon, in the order and orientation of createPoly
+    angles = np.radians(360/streams * np.arange(streams) + shift)
+    return np.column_stack([radius * np.sin(angles), radius * np.cos(angles)])
+
+
+@lru_cache(maxsize=None)
+def distanceTables(rings):  # ring of every stream, and the step and Euclidean distance tables, for any rotation
+    ring = np.concatenate([np.full(streams, k, dtype=np.int16) for k, (streams, radius) in enumerate(rings)])
+    steps = np.full((len(ring), len(ring)), -1, dtype=np.int16)
+    start = 0
+    for streams, radius in rings:
+        index = np.arange(streams)
+        difference = np.abs(index[:, None] - index[None, :])
+        steps[start:start+streams, start:start+streams] = np.minimum(difference, streams - difference)
+        start += streams
+    vertices = np.concatenate([ringVertices(streams, radius, 0) for streams, radius in rings])
+    distances = np.hypot(*(vertices[:, None, :] - vertices[None, :, :]).transpose(2, 0, 1))
+    for table in (ring, steps, distances):
+        table.setflags(write=False)  # shared by every layout of these rings
+    return ring, steps, distances
+
+
+@lru_cache(maxsize=1024)
+def ringLayout(rings, shift):
+    ring, steps, distances = distanceTables(rings)
+    vertices = np.concatenate([ringVertices(streams, radius, shift) for streams, radius in rings])
+    vertices.setflags(write=False)
+    return Layout(rings, shift, vertices, ring, steps, distances)
+
+
+def buildLayout(streams, radius, shift, rings=()):
+    """ Layout of a polygon of streams sides and radius, rotated by shift degrees, plus any extra rings given as
+    (streams, radius) pairs. Asking again for the same layout returns the cached one."""
+    return ringLayout(((streams, radius),) + tuple(rings), shift)
@@ -0,0 +1,99 @@
+""" This module builds the user interface from DesignerFile.ui one page at a time. The main window is built with empty
+pages, and only the consent page is filled in before the window first appears: the other pages are built in idle time
+once it is on screen, or straight away if they are asked for before. The time the participant waits (first paint,
+pages ready, first trial) is kept for the timing report."""
+
+import io
+import time
+import xml.etree.ElementTree as ElementTree
+
+from PyQt5 import uic
+from PyQt5.QtCore import *
+
+
+class LazyUi:  # stands for the Ui_MainWindow of DesignerCode.py, the widgets of a page appear once it is built
+    def __init__(self, path, stack='swPages'):
+        root = ElementTree.parse(path).getroot()
+        self.frame = root
+        self.pages = root.find(".//widget[@name='{0}']".format(stack)).findall('widget')
+        self.pageElements = [ElementTree.fromstring(ElementTree.tostring(page)) for page in self.pages]
+        for page in self.pages:  # the main window is loaded with empty pages
+            for child in list(page):
+                page.remove(child)
+        self.setups = [[] for page in self.pages]  # run once their page is built
+        self.built = [False] * len(self.pages)
+        self.buildTimes = {}  # page name: milliseconds taken to build it
+        self.readyAt = None   # perf_counter when every page was built
+
+    def setupUi(self, window):  # main window, pages in place but empty, and the first page
+        frame = ElementTree.tostring(self.frame)
+        uic.loadUi(io.BytesIO(frame), window)
+        for element in list(self.frame.iter('widget'))[1:]:  # widgets inside the main window
+            setattr(self, element.get('name'), getattr(window, element.get('name')))
+        self.buildPage(0)
+
+    def buildPage(self, index):  # loads the widgets of a page from the Designer file, then runs its setups
+        if self.built[index]:
+            return
+        start = time.perf_counter()
+        element = self.pageElements[index]
+        document = ElementTree.Element('ui', version='4.0')
+        ElementTree.SubElement(document, 'class').text = element.get('name')
+        document.append(element)
+        page = getattr(self, element.get('name'))
+        uic.loadUi(io.BytesIO(ElementTree.tostring(document)), page)
+        for child in list(element.iter('widget'))[1:]:  # widgets inside the page
+            setattr(self, child.get('name'), getattr(page, child.get('name')))
+        self.built[index] = True
+        for setup in self.setups[index]:
+            setup()
+        self.buildTimes[element.get('name')] = (time.perf_counter() - start) * 1000
+        if all(self.built):
+            self.readyAt = time.perf_counter()
+
+    def buildPages(self, last):  # every page up to last, in order
+        for index in range(min(last + 1, len(self.pages))):
+            self.buildPage(index)
+
+    def onBuild(self, index, setup):  # setup (layout, connections) of a page, run now if it is already built
+        self.setups[index].append(setup)
+        if self.built[index]:
+            setup()
+
+    def buildWhenIdle(self):  # one page per turn of the event loop, the window keeps responding in between
+        if not all(self.built):
+            self.buildPage(self.built.index(False))
+            QTimer.singleShot(0, self.buildWhenIdle)
+
+
+class StartupLog(QObject):  # times the launch, from the start of the program to its first trial
+    painted = pyqtSignal()  # the watched widget is on screen for the first time
+
+    def __init__(self, launched, parent=None):
+        super().__init__(parent)
+        self.launched = launched  # perf_counter when the program started
+        self.marks = {}           # event: perf_counter, first occurrence only
+
+    def mark(self, event):
+        self.marks.setdefault(event, time.perf_counter())
+
+    def watch(self, widget):  # marks the first paint of widget
+        widget.installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint and 'first paint' not in self.marks:
+            self.mark('first paint')
+            watched.removeEventFilter(self)
+            QTimer.singleShot(0, self.painted.emit)  # after the paint is done
+        return False
+
+    def report(self, ui):  # milliseconds since the start of the program, and time taken by every page
+        marks = dict(self.marks)
+        if ui.readyAt is not None:
+            marks['pages ready'] = ui.readyAt
+        events = sorted(marks.items(), key=lambda item: item[1])
+        lines = ['Startup: ' + ', '.join('{0} {1:.1f} ms'.format(event, (moment - self.launched) * 1000)
+                                         for event, moment in events),
+                 'Pages built: ' + ', '.join('{0} {1:.1f} ms'.format(name, milliseconds)
+                                             for name, milliseconds in ui.buildTimes.items())]
+        return '\n'.join(lines) + '\n'
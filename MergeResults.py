@@ -0,0 +1,227 @@
+""" This module merges the results files of every lab machine into one dataset. Each .csv file (header or not, in any
+of the encodings found on the machines) or results database is parsed and validated in a worker process, and saved as
+a Parquet part. The parts are then merged, keeping one row per participant (name and email) and trial number: a row
+found in several files is taken from the most recently modified one.
+
+A manifest remembers the size and modification time of every file parsed, so that running the merge again only parses
+the files which changed since. Requires pyarrow.
+
+python MergeResults.py stations/*.csv stations/*.db --out merged
+python MergeResults.py stations --out merged --csv merged.csv    folders are searched for .csv and .db files
+
+The merged trials can be loaded with TrialData.loadTrials('merged/trials').
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from TrialData import COLUMNS, OPTIONAL, UNKNOWN_DATE, arrowSchema, defaultNames, detectEncoding, importArrow, \
+    readCsvHeader, readDatabaseChunks
+from ResultsStore import CSV_HEADER
+
+NUMBER = r'^\s*-?\d+(\.\d*)?([eE][-+]?\d+)?\s*$'
+KEY = ['name', 'email', 'trialNo']  # a trial is recorded once per participant
+
+# range of valid values, rows outside of it are rejected
+RANGES = {'age': (0, 150), 'gender': (0, 1), 'trialNo': (1, None), 'diffTime': (0, None), 'distanceIndex': (0, None),
+          'distanceUnits': (0, None), 'outcome1': (0, 1), 'outcome2': (0, 1), 'rt1': (0, None), 'rt2': (0, None)}
+
+
+def readCsvTable(pa, path, encoding):  # every field as a string, rows with the wrong number of fields are skipped
+    import pyarrow.csv
+    with open(path, newline='', encoding=encoding) as file:
+        first = next(csv.reader(file), [])
+    header = readCsvHeader(first)
+    names = header or defaultNames(len(first))
+    skipped = []
+
+    def skip(row):
+        skipped.append(row.number)
+        return 'skip'
+    table = pa.csv.read_csv(path, read_options=pa.csv.ReadOptions(column_names=names, skip_rows=1 if header else 0,
+                                                                   encoding=encoding),
+                            parse_options=pa.csv.ParseOptions(invalid_row_handler=skip),
+                            convert_options=pa.csv.ConvertOptions(column_types={name: pa.string() for name in names}))
+    return table, len(skipped)
+
+
+def validate(pa, table):  # typed trials of a table of strings, and the number of rows rejected
+    import pyarrow.compute as pc
+    valid = pc.greater(pc.utf8_length(pc.utf8_trim_whitespace(table['name'])), 0)
+    columns = {}
+    for name, kind in COLUMNS:
+        values = pc.utf8_trim_whitespace(table[name]) if name in table.column_names else None
+        if kind is str:
+            columns[name] = values if values is not None else pa.nulls(table.num_rows, pa.string())
+            continue
+        if values is None:
+            if name not in OPTIONAL:
+                valid = pc.and_(valid, False)
+            columns[name] = pa.nulls(table.num_rows, pa.float64())
+            continue
+        isNumber = pc.fill_null(pc.match_substring_regex(values, NUMBER), False)
+        numbers = pc.cast(pc.if_else(isNumber, values, '-1'), pa.float64())
+        low, high = RANGES[name]
+        inRange = isNumber
+        if low is not None:
+            inRange = pc.and_(inRange, pc.greater_equal(numbers, low))
+        if high is not None:
+            inRange = pc.and_(inRange, pc.less_equal(numbers, high))
+        if name in OPTIONAL:  # an empty field is an unknown value
+            isEmpty = pc.fill_null(pc.equal(values, ''), True)
+            valid = pc.and_(valid, pc.or_(isEmpty, inRange))
+            numbers = pc.if_else(isEmpty, pa.scalar(None, pa.float64()), numbers)
+        else:
+            valid = pc.and_(valid, inRange)
+        if kind is not np.float64:  # whole numbers only in integer columns
+            valid = pc.and_(valid, pc.equal(pc.floor(numbers), numbers))
+        columns[name] = numbers
+    valid = pc.fill_null(valid, False)
+    columns['sessionDate'] = pa.array([UNKNOWN_DATE] * table.num_rows, pa.string())
+    typed = pa.table(columns).filter(valid)
+    return typed.cast(arrowSchema(pa)), table.num_rows - typed.num_rows
+
+
+def readDatabaseTable(pa, path):  # trials of a results database, already typed by SQLite
+    schema = arrowSchema(pa)
+    tables = [pa.table(chunk, schema=schema) for chunk in readDatabaseChunks(path)]
+    return pa.concat_tables(tables) if tables else schema.empty_table()
+
+
+def parseSource(path, partPath):  # runs in a worker process: parses and validates one file into a Parquet part
+    pa = importArrow()
+    import pyarrow.parquet
+    if path.endswith('.db'):
+        table, malformed, rejected, encoding = readDatabaseTable(pa, path), 0, 0, None
+    else:
+        encoding = detectEncoding(path)
+        strings, malformed = readCsvTable(pa, path, encoding)
+        table, rejected = validate(pa, strings)
+    pa.parquet.write_table(table, partPath + '.tmp')
+    os.replace(partPath + '.tmp', partPath)
+    return {'rows': table.num_rows, 'malformed': malformed, 'rejected': rejected, 'encoding': encoding}
+
+
+def findSources(paths):  # files given, and .csv and .db files of the folders given
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, subfolders, files in os.walk(path):
+                sources += [os.path.join(folder, file) for file in sorted(files) if file.endswith(('.csv', '.db'))]
+        else:
+            sources.append(path)
+    return [os.path.abspath(source) for source in sources]
+
+
+def loadManifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def saveManifest(manifest, path):  # written to a temporary file first, an interrupted merge never corrupts it
+    with open(path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def fileState(path):
+    status = os.stat(path)
+    return {'size': status.st_size, 'mtimeNs': status.st_mtime_ns}
+
+
+def parseChanged(sources, manifest, partsFolder, workers, manifestPath):  # parses the new and changed files only
+    changed = []
+    for source in sources:
+        entry = manifest.get(source)
+        part = os.path.join(partsFolder, hashlib.sha1(source.encode()).hexdigest()[:16] + '.parquet')
+        if entry is None or {key: entry[key] for key in ('size', 'mtimeNs')} != fileState(source) \
+                or not os.path.exists(part):
+            changed.append((source, part))
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [(source, part, fileState(source), pool.submit(parseSource, source, part))
+                   for source, part in changed]
+        for source, part, state, future in futures:
+            try:
+                result = future.result()
+            except Exception as error:  # an unreadable file does not stop the merge of the others
+                print('{0}: not merged, {1}'.format(source, error))
+                manifest.pop(source, None)
+                continue
+            manifest[source] = dict(state, part=part, **result)
+            saveManifest(manifest, manifestPath)  # progress is kept after every file
+            print('{0}: {1} rows, {2} malformed, {3} rejected{4}'.format(
+                source, result['rows'], result['malformed'], result['rejected'],
+                ', ' + result['encoding'] if result['encoding'] else ''))
+    return len(changed)
+
+
+def mergeParts(pa, manifest):  # one row per participant and trial, taken from the most recent file
+    import pyarrow.parquet
+    entries = sorted(manifest.values(), key=lambda entry: entry['mtimeNs'])
+    tables = [pa.parquet.read_table(entry['part']) for entry in entries]
+    if not tables:
+        return arrowSchema(pa).empty_table()
+    table = pa.concat_tables(tables)  # oldest file first, so the last row of a trial is the most recent one
+    table = table.append_column('row', pa.array(np.arange(table.num_rows, dtype=np.int64)))
+    latest = table.group_by(KEY).aggregate([('row', 'max')])['row_max']
+    return table.take(latest).drop_columns(['row']).sort_by([(name, 'ascending') for name in KEY])
+
+
+def writeMerged(pa, table, folder, csvPath=None):  # replaces the previous merged dataset as a whole
+    temporary = folder + '.tmp'
+    shutil.rmtree(temporary, ignore_errors=True)
+    pa.dataset.write_dataset(table, temporary, format='parquet',
+                             partitioning=pa.dataset.partitioning(pa.schema([('sessionDate', pa.string())]),
+                                                                  flavor='hive'))
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(temporary, folder)
+    if csvPath:
+        import pyarrow.csv
+        with open(csvPath, 'wb') as file:
+            file.write((','.join(CSV_HEADER) + '\n').encode())
+            pa.csv.write_csv(table.drop_columns(['sessionDate']), file,
+                             pa.csv.WriteOptions(include_header=False, quoting_style='needed'))
+
+
+def merge(paths, out, workers=None, csvPath=None):
+    pa = importArrow()
+    partsFolder = os.path.join(out, 'parts')
+    os.makedirs(partsFolder, exist_ok=True)
+    manifestPath = os.path.join(out, 'manifest.json')
+    manifest = loadManifest(manifestPath)
+    for source in [source for source in manifest if not os.path.exists(source)]:  # files deleted since
+        print('{0}: gone, removed from the merge'.format(source))
+        if os.path.exists(manifest[source]['part']):
+            os.remove(manifest[source]['part'])
+        del manifest[source]
+    saveManifest(manifest, manifestPath)
+
+    changed = parseChanged(findSources(paths), manifest, partsFolder, workers, manifestPath)
+    table = mergeParts(pa, manifest)
+    writeMerged(pa, table, os.path.join(out, 'trials'), csvPath)
+    rows = sum(entry['rows'] for entry in manifest.values())
+    print('{0} files ({1} parsed), {2} trials, {3} duplicates removed'.format(len(manifest), changed, table.num_rows,
+                                                                            rows - table.num_rows))
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help='.csv files, results databases (.db) or folders')
+    parser.add_argument('--out', required=True, help='folder of the merged dataset and manifest')
+    parser.add_argument('--csv', help='also write the merged trials to a .csv file, as the original experiment did')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    options = parser.parse_args()
+    start = time.perf_counter()
+    merge(options.sources, options.out, options.workers, options.csv)
+    print('merged in {0:.1f} s'.format(time.perf_counter() - start))
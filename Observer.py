@@ -0,0 +1,40 @@
+""" This module contains synthetic participants, used to run the experiment without anyone in front of the screen.
+An observer reports T1 and T2 with probabilities depending on the lag (and optionally the distance) between them."""
+
+import math
+from random import Random
+
+
+class BlinkObserver:  # T2 accuracy follows an attentional blink curve: lag 1 sparing, dip, then recovery
+    def __init__(self, accuracyT1=0.9, sparing=0.8, trough=0.35, recovery=0.85, troughLag=3, width=1.2,
+                 distanceCost=0.0, guessRate=0.1, seed=None):
+        self.accuracyT1 = accuracyT1      # probability of reporting T1 correctly
+        self.sparing = sparing            # T2|T1 accuracy at lag 1
+        self.trough = trough              # T2|T1 accuracy at the bottom of the blink
+        self.recovery = recovery          # T2|T1 accuracy once the blink is over
+        self.troughLag = troughLag        # lag (in frames) of the bottom of the blink
+        self.width = width                # spread of the blink (in frames)
+        self.distanceCost = distanceCost  # accuracy lost per polygon side between the targets
+        self.guessRate = guessRate        # chance of answering 0 (no guess) when a target is missed
+        self.rng = Random(seed)
+
+    def accuracyT2(self, lag, distance=0):  # probability of reporting T2 correctly given T1 was seen
+        if lag <= 1:
+            accuracy = self.sparing
+        else:
+            dip = math.exp(-(lag - self.troughLag)**2 / (2 * self.width**2))
+            accuracy = self.recovery - (self.recovery - self.trough) * dip
+        return min(1.0, max(0.0, accuracy - self.distanceCost * distance))
+
+    def report(self, target, accuracy, targets):  # digit typed for one target
+        if self.rng.random() < accuracy:
+            return str(target)
+        if self.rng.random() < self.guessRate:
+            return '0'
+        return str(self.rng.choice([digit for digit in targets if digit != target]))
+
+    def respond(self, T1, T2, lag, distance, targets):  # both digits typed at the end of a trial
+        seenT1 = self.rng.random() < self.accuracyT1
+        answer1 = str(T1) if seenT1 else self.report(T1, 0.0, targets)
+        accuracy = self.accuracyT2(lag, distance) if seenT1 else self.recovery  # no blink without T1
+        return answer1, self.report(T2, accuracy, targets)
@@ -0,0 +1,231 @@
+""" Monte Carlo simulation of whole experiments, to choose the number of streams, frames, trials, participants and
+lags before running anyone. Every virtual participant gets a design drawn by Design.py and goes through its trials
+with the state and scoring of the experiment, answering like a BlinkObserver whose T1 accuracy, trough and recovery
+are drawn for every participant around the means given (--sd-trough and the like). For each configuration the simulator
+reports the trials per lag x distance cell, the power to detect the blink and the coverage of its confidence interval.
+
+The blink is measured per participant as T2|T1 accuracy at the blink lags minus T2|T1 accuracy at the baseline lags,
+and tested across participants with a one-sided paired t-test.
+
+python PowerSimulation.py --streams 5 7 9 --trials 48 96 --participants 10 20 30
+python PowerSimulation.py --max-lag 6 8 --experiments 1000 --save power.json
+"""
+
+import argparse
+import functools
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Design import buildDesign, designCells, LAG, DISTANCE
+from Layout import buildLayout
+from Observer import BlinkObserver
+from TrialState import SessionState, takeTrial, measureDistance, scoreTrial
+
+TARGETS = list(range(2, 10))
+
+
+def tDistribution(t, df):  # P(T <= t) for Student's t with an integer df, exact (finite series, A&S 26.7.3 and 26.7.4)
+    theta = math.atan(abs(t) / math.sqrt(df))
+    cos2 = math.cos(theta) ** 2
+    term = total = 1.0
+    if df % 2:
+        for k in range(1, (df - 1) // 2):
+            term *= cos2 * 2*k / (2*k + 1)
+            total += term
+        area = 2 / math.pi * (theta + (math.sin(theta) * math.cos(theta) * total if df > 1 else 0))
+    else:
+        for k in range(1, df // 2):
+            term *= cos2 * (2*k - 1) / (2*k)
+            total += term
+        area = math.sin(theta) * total
+    return 0.5 + math.copysign(area, t) / 2
+
+
+@functools.lru_cache(maxsize=None)
+def tQuantile(p, df):  # quantile of Student's t distribution, by bisection of tDistribution, exact for every df
+    if p < 0.5:
+        return -tQuantile(1 - p, df)
+    low, high = 0.0, 1.0
+    while tDistribution(high, df) < p:
+        low, high = high, high * 2
+    for step in range(60):
+        middle = (low + high) / 2
+        low, high = (middle, high) if tDistribution(middle, df) < p else (low, middle)
+    return (low + high) / 2
+
+
+def simulateParticipant(config, observer, rng):  # lag, distance and outcomes of every trial of one session
+    session = SessionState(config['frames'], config['streams'])
+    lags = range(1, config['maxLag'] + 1)
+    session.startBlock(buildDesign(config['trials'], config['streams'], TARGETS, lags,
+                                   lastFrame=config['frames'] - 5, rng=rng))  # 25 of 30 frames, as in the experiment
+    trial = session.trial
+    layout = buildLayout(config['streams'], 180, 0)
+    outcomes = np.empty((config['trials'], 2), dtype=np.int8)
+    for row in range(config['trials']):
+        trial.reset()
+        takeTrial(trial, session)
+        measureDistance(trial, layout)
+        trial.answers[:] = observer.respond(trial.T1, trial.T2, trial.diffFrame, trial.distanceIndex, TARGETS)
+        scoreTrial(trial)
+        outcomes[row] = trial.outcomes
+    return session.design[:, LAG], session.design[:, DISTANCE], outcomes
+
+
+def blinkEffect(lags, outcomes, blinkLags, baselineLags):  # baseline minus blink T2|T1 accuracy, None if undefined
+    seen = outcomes[:, 0] == 1
+    blink = seen & np.isin(lags, blinkLags)
+    baseline = seen & np.isin(lags, baselineLags)
+    if not blink.any() or not baseline.any():
+        return None
+    return outcomes[baseline, 1].mean() - outcomes[blink, 1].mean()
+
+
+def trueEffect(config, observer):  # blink effect of the observer, averaged over the distances of the design
+    distances = range(config['streams']//2 + 1)
+
+    def accuracy(lags):
+        return np.mean([observer.accuracyT2(lag, distance) for lag in lags for distance in distances])
+    return accuracy(config['baselineLags']) - accuracy(config['blinkLags'])
+
+
+def drawObserver(config, rng):  # a participant of the population: parameters drawn around the means of the observer
+    parameters = dict(config['observer'])
+    for name, sd in config['spread'].items():
+        parameters[name] = float(np.clip(rng.normal(parameters[name], sd), 0, 1))  # accuracies
+    return BlinkObserver(seed=int(rng.integers(2**32)), **parameters)
+
+
+def populationEffect(config, draws=2000):  # mean blink effect of the population, what the t-test estimates
+    rng = np.random.default_rng(0)
+    return float(np.mean([trueEffect(config, drawObserver(config, rng)) for draw in range(draws)]))
+
+
+def simulateExperiments(config, seeds):  # runs in a worker process: a batch of experiments of one configuration
+    cells = designCells(config['streams'], range(1, config['maxLag'] + 1))
+    counts = np.zeros(len(cells))       # trials per cell, summed over participants and experiments
+    seenCounts = np.zeros(len(cells))   # trials per cell where T1 was reported, the ones T2|T1 is computed on
+    effects = []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        differences = []
+        for participant in range(config['participants']):  # participants differ, not only by binomial noise
+            lags, distances, outcomes = simulateParticipant(config, drawObserver(config, rng), rng)
+            cell = (lags - 1) * (config['streams']//2 + 1) + distances  # row of the cell in designCells
+            counts += np.bincount(cell, minlength=len(cells))
+            seenCounts += np.bincount(cell[outcomes[:, 0] == 1], minlength=len(cells))
+            difference = blinkEffect(lags, outcomes, config['blinkLags'], config['baselineLags'])
+            if difference is not None:
+                differences.append(difference)
+        effects.append(differences)
+    return counts, seenCounts, effects
+
+
+def summarise(config, counts, seenCounts, effects, alpha):  # power and coverage over all the experiments
+    truth = populationEffect(config)
+    detected = covered = 0
+    for differences in effects:
+        n = len(differences)
+        if n < 2:
+            continue
+        mean = np.mean(differences)
+        se = np.std(differences, ddof=1) / math.sqrt(n)
+        if se == 0:
+            detected += mean > 0
+            covered += mean == truth
+            continue
+        detected += mean / se > tQuantile(1 - alpha, n - 1)
+        half = tQuantile(1 - alpha/2, n - 1) * se
+        covered += mean - half <= truth <= mean + half
+    sessions = len(effects) * config['participants']
+    return dict(config, trueEffect=truth, power=detected / len(effects), coverage=covered / len(effects),
+                cellTrials=(counts / sessions).tolist(), cellSeenTrials=(seenCounts / sessions).tolist())
+
+
+def configurations(options):  # every combination of the values given on the command line
+    observer = {'accuracyT1': options.accuracy_t1, 'trough': options.trough, 'recovery': options.recovery,
+                'troughLag': options.trough_lag, 'distanceCost': options.distance_cost}
+    spread = {'accuracyT1': options.sd_accuracy_t1, 'trough': options.sd_trough, 'recovery': options.sd_recovery}
+    for streams, frames, trials, participants, maxLag in itertools.product(options.streams, options.frames,
+                                                                           options.trials, options.participants,
+                                                                           options.max_lag):
+        if frames - 5 - maxLag < 10:
+            print('skipped: {0} frames leave no room for T1 before lag {1}'.format(frames, maxLag))
+            continue
+        yield {'streams': streams, 'frames': frames, 'trials': trials, 'participants': participants, 'maxLag': maxLag,
+               'blinkLags': [lag for lag in options.blink_lags if lag <= maxLag],
+               'baselineLags': [lag for lag in options.baseline_lags if lag <= maxLag] or [maxLag],
+               'observer': observer, 'spread': spread}
+
+
+def run(configs, experiments, alpha, seed, workers, batch=25):  # configurations simulated across a process pool
+    root = np.random.SeedSequence(seed)
+    with ProcessPoolExecutor(workers) as pool:
+        jobs = []
+        for config in configs:  # every configuration is split in batches of experiments, each with its own seeds
+            seeds = root.spawn(experiments)
+            futures = [pool.submit(simulateExperiments, config, seeds[start:start + batch])
+                       for start in range(0, experiments, batch)]
+            jobs.append((config, futures))
+        for config, futures in jobs:
+            counts, seenCounts, effects = 0, 0, []
+            for future in futures:
+                batchCounts, batchSeen, batchEffects = future.result()
+                counts = counts + batchCounts
+                seenCounts = seenCounts + batchSeen
+                effects += batchEffects
+            yield summarise(config, counts, seenCounts, effects, alpha)
+
+
+def printSummary(summary, showCells):
+    line = ('streams={streams:<3} frames={frames:<4} trials={trials:<4} participants={participants:<3} '
+            'maxLag={maxLag:<2} trials/cell={0:>6.2f} (T1 seen {1:>6.2f})  effect={trueEffect:.3f}  '
+            'power={power:.3f}  coverage={coverage:.3f}')
+    print(line.format(min(summary['cellTrials']), min(summary['cellSeenTrials']), **summary))
+    if showCells:
+        cells = designCells(summary['streams'], range(1, summary['maxLag'] + 1))
+        for (lag, distance), trials, seen in zip(cells, summary['cellTrials'], summary['cellSeenTrials']):
+            print('    lag {0} distance {1}: {2:.2f} trials, {3:.2f} with T1 seen'.format(lag, distance, trials, seen))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--streams', type=int, nargs='+', default=[7])
+    parser.add_argument('--frames', type=int, nargs='+', default=[30])
+    parser.add_argument('--trials', type=int, nargs='+', default=[96], help='trials per participant')
+    parser.add_argument('--participants', type=int, nargs='+', default=[20])
+    parser.add_argument('--max-lag', type=int, nargs='+', default=[6], help='lags go from 1 to this many frames')
+    parser.add_argument('--blink-lags', type=int, nargs='+', default=[2, 3, 4])
+    parser.add_argument('--baseline-lags', type=int, nargs='+', default=[6, 7, 8])
+    parser.add_argument('--accuracy-t1', type=float, default=0.9)
+    parser.add_argument('--trough', type=float, default=0.35, help='T2|T1 accuracy at the bottom of the blink')
+    parser.add_argument('--recovery', type=float, default=0.85, help='T2|T1 accuracy after the blink')
+    parser.add_argument('--trough-lag', type=float, default=3)
+    parser.add_argument('--distance-cost', type=float, default=0.0, help='T2|T1 accuracy lost per side')
+    parser.add_argument('--sd-accuracy-t1', type=float, default=0.05, help='between-participant SD of T1 accuracy')
+    parser.add_argument('--sd-trough', type=float, default=0.1, help='between-participant SD of the trough')
+    parser.add_argument('--sd-recovery', type=float, default=0.05, help='between-participant SD of the recovery')
+    parser.add_argument('--experiments', type=int, default=200, help='simulated experiments per configuration')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--cells', action='store_true', help='print the trials of every lag x distance cell')
+    parser.add_argument('--save', help='save the summaries to this file')
+    options = parser.parse_args()
+
+    start = time.perf_counter()
+    summaries = []
+    for summary in run(list(configurations(options)), options.experiments, options.alpha, options.seed,
+                       options.workers):
+        printSummary(summary, options.cells)
+        summaries.append(summary)
+    print('{0} configurations in {1:.1f} s'.format(len(summaries), time.perf_counter() - start))
+    if options.save:
+        with open(options.save, 'w') as file:
+            json.dump(summaries, file, indent=1)
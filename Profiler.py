@@ -0,0 +1,85 @@
+""" This module times the functions of the experiment called on the main thread, for a session run with --profile or
+the AB_PROFILE environment variable set to the file to write. The functions are replaced by wrappers recording when
+each call started and how long it took, in the lane of the trial it belongs to; nothing is wrapped otherwise, so an
+unprofiled session runs exactly as before. The calls are exported as a Chrome trace (chrome://tracing, or
+https://ui.perfetto.dev), one lane per trial, and summarised per function."""
+
+import functools
+import inspect
+import json
+
+import numpy as np
+from time import perf_counter_ns
+
+
+def positionalCount(function):  # number of positional arguments function takes, None if any number
+    count = 0
+    for parameter in inspect.signature(function).parameters.values():
+        if parameter.kind == parameter.VAR_POSITIONAL:
+            return None
+        if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD):
+            count += 1
+    return count
+
+
+class Profiler:
+    def __init__(self, lane=lambda: 0, laneName='trial {0}'.format):
+        self.lane = lane          # lane of a call, e.g. the number of the trial running
+        self.laneName = laneName
+        self.calls = []           # (function, start (ns), duration (ns), lane, arguments shown in the trace)
+        self.origin = perf_counter_ns()
+
+    def wrap(self, name, function, details=None):  # details(start) gives arguments shown with the call in the trace
+        calls = self.calls
+        lane = self.lane
+        count = positionalCount(function)  # Qt signals pass their arguments to slots taking fewer, like Qt does
+
+        @functools.wraps(function)
+        def profiled(*arguments):
+            start = perf_counter_ns()
+            try:
+                return function(*arguments[:count])
+            finally:
+                calls.append((name, start, perf_counter_ns() - start, lane(), details(start) if details else None))
+        return profiled
+
+    def instrument(self, namespaces, names, details=None):
+        """ Replaces the functions named in the first namespace (a module's globals) by their profiled version, in
+        every namespace holding the same function, e.g. the modules which imported it with *."""
+        details = details or {}
+        for name in names:
+            function = namespaces[0][name]
+            profiled = self.wrap(name, function, details.get(name))
+            for namespace in namespaces:
+                if namespace.get(name) is function:
+                    namespace[name] = profiled
+
+    def trace(self):  # Chrome trace events, times in microseconds from the start of the profile
+        events = []
+        for lane in sorted({call[3] for call in self.calls}):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': lane,
+                           'args': {'name': self.laneName(lane)}})
+            events.append({'name': 'thread_sort_index', 'ph': 'M', 'pid': 1, 'tid': lane,
+                           'args': {'sort_index': lane}})
+        for name, start, duration, lane, details in self.calls:
+            event = {'name': name, 'ph': 'X', 'pid': 1, 'tid': lane, 'ts': (start - self.origin) / 1000,
+                     'dur': duration / 1000}
+            if details:
+                event['args'] = details
+            events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.trace(), file)
+
+    def summary(self):  # calls, mean, p95 and max duration (ms) of every function, slowest first
+        durations = {}
+        for name, start, duration, lane, details in self.calls:
+            durations.setdefault(name, []).append(duration / 1000000)
+        lines = ['{0:<16}{1:>8}{2:>12}{3:>12}{4:>12}'.format('function', 'calls', 'mean (ms)', 'p95 (ms)', 'max (ms)')]
+        for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+            values = np.array(values)
+            lines.append('{0:<16}{1:>8}{2:>12.3f}{3:>12.3f}{4:>12.3f}'.format(
+                name, len(values), values.mean(), np.percentile(values, 95), values.max()))
+        return '\n'.join(lines) + '\n'
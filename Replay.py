@@ -0,0 +1,152 @@
+""" This module draws the trials of a recorded session again, frame by frame, from the seed and configuration stored
+with the participant in the results database. It uses the same functions as the experiment (Design, TrialState,
+Layout) without Qt, so a trial is rebuilt in microseconds and the stimuli never need to be stored. The conditions of an
+adaptive design also depend on the answers, which are read from the results too.
+
+python Replay.py attentionalBlink.db --participant 3 --trial 12     prints the frames of trial 12 of participant 3
+python Replay.py attentionalBlink.db --participant Ann --practice 1  prints the frames of the first practice trial
+python Replay.py attentionalBlink.db --participant 3 --check         replays every trial recorded and compares the
+                                                                     lag and distances with the results
+"""
+
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from AdaptiveDesign import AdaptiveDesign
+from Design import buildDesign
+from Layout import buildLayout
+from Schedule import buildSymbols, targetCode
+from ResultsStore import connect
+from TrialState import MAIN_BLOCK, PRACTICE_BLOCK, SessionState, blockRng, drawShift, fillSchedule, measureDistance, \
+    takeTrial, trialRng
+
+
+class Replayer:  # the trials of one session, drawn again as prepareTrial drew them
+    def __init__(self, seed, config, outcomes=()):
+        self.seed = seed
+        self.config = config
+        self.outcomes = outcomes  # outcomes of T1 and T2 of every main trial in order, for an adaptive design
+        self.symbols = buildSymbols(config['distractors'], config['targets'])
+        self.session = SessionState(config['framesMax'], config['streams'])
+        self.practice = config['practiceNumber'] if config['practiceTrial'] is True else 0
+        self.designs = {}  # block: design, drawn once
+        self.adaptive = None
+
+    def design(self, block):
+        if block not in self.designs:
+            config = self.config
+            trials = self.practice if block == PRACTICE_BLOCK else config['trialMax']
+            if block == MAIN_BLOCK and config.get('adaptive'):  # rows are chosen as the trials are asked for
+                self.adaptive = AdaptiveDesign(config['streams'], config['targets'], config['targetWidth'],
+                                               blockRng(self.seed, block), config['lags'], config['minCellTrials'],
+                                               firstFrame=config['firstFrame'], lastFrame=config['lastFrame'])
+                for row, outcomes in enumerate(self.outcomes):
+                    self.adaptive.record(row, outcomes)
+                self.designs[block] = np.zeros((trials, 7), dtype=np.int16)
+                return self.designs[block]
+            self.designs[block] = buildDesign(trials, config['streams'], config['targets'], config['lags'],
+                                              config['firstFrame'], config['lastFrame'], blockRng(self.seed, block))
+        return self.designs[block]
+
+    def sessionNumber(self, trialNo, practice=False):  # number of a trial in the session, practice trials first
+        return trialNo if practice else trialNo + self.practice
+
+    def trial(self, number):  # trial numbered from 1 in the session, practice included
+        config = self.config
+        if not 1 <= number <= self.practice + config['trialMax']:
+            raise ValueError('the session has no trial {0}'.format(number))
+        if number <= self.practice:
+            block, row = PRACTICE_BLOCK, number - 1
+        else:
+            block, row = MAIN_BLOCK, number - 1 - self.practice
+        session = self.session
+        session.startBlock(self.design(block))
+        if block == MAIN_BLOCK and self.adaptive:
+            for chosen in range(len(self.adaptive.chosen), row + 1):  # in order, as the experiment chose them
+                self.adaptive.choose(session.design, chosen)
+        session.designRow = row
+        trial = session.trial
+        trial.reset()
+        rng = trialRng(self.seed, number)
+        trial.shift = drawShift(rng)
+        trial.layout = buildLayout(config['streams'], config['radius'], trial.shift)
+        takeTrial(trial, session)
+        distractors, targets = config['distractors'], config['targets']
+        fillSchedule(trial, len(distractors), targetCode(trial.T1, distractors, targets),
+                     targetCode(trial.T2, distractors, targets), rng)
+        measureDistance(trial, trial.layout)
+        return trial
+
+    def frames(self, trial):  # symbols shown by every stream, one list per frame
+        return [[self.symbols[code] for code in row] for row in trial.schedule]
+
+
+def loadSession(path, participant):  # seed and configuration of a participant, given by id or name (latest session)
+    connection = connect(path)
+    row = connection.execute('SELECT participantId, name, seed, config FROM participants '
+                             'WHERE participantId = ? OR name = ? ORDER BY participantId DESC LIMIT 1',
+                             (participant, participant)).fetchone()
+    connection.close()
+    if row is None:
+        raise ValueError('no participant {0} in {1}'.format(participant, path))
+    if row[2] is None:
+        raise ValueError('participant {0} was recorded before the seeds were stored'.format(participant))
+    return row[0], row[1], row[2], json.loads(row[3])
+
+
+def recordedTrials(path, participantId):  # trial number, T1-T2 time, distances and outcomes of every trial recorded
+    connection = connect(path)
+    rows = connection.execute('SELECT trialNo, diffTime, distanceSides, distanceUnits, outcome1, outcome2 FROM trials '
+                              'WHERE participantId = ? ORDER BY trialNo', (participantId,)).fetchall()
+    connection.close()
+    return rows
+
+
+def checkSession(replayer, rows):  # replays every trial recorded, returns the trial numbers that do not match
+    interval = replayer.config['interval']
+    mismatches = []
+    for trialNo, diffTime, distanceSides, distanceUnits, outcome1, outcome2 in rows:
+        trial = replayer.trial(replayer.sessionNumber(trialNo))
+        if not (math.isclose(trial.diffFrame * interval / 1000, diffTime) and trial.distanceIndex == distanceSides
+                and math.isclose(trial.distanceUnits, distanceUnits, rel_tol=1e-9)):
+            mismatches.append(trialNo)
+    return mismatches
+
+
+def printTrial(replayer, trial, number):
+    print('Trial {0} of the session: T1 {1} on frame {2}, stream {3}; T2 {4} on frame {5}, stream {6}; '
+          'rotation {7} degrees; distance {8} sides, {9:.1f} units'.format(
+              number, trial.T1, trial.frameT1, trial.index1, trial.T2, trial.frameT2, trial.index2, trial.shift,
+              trial.distanceIndex, trial.distanceUnits))
+    for frame, symbols in enumerate(replayer.frames(trial), 1):
+        print('{0:>3}  {1}'.format(frame, ' '.join(symbols)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('database')
+    parser.add_argument('--participant', required=True, help='participant id, or name (their latest session)')
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument('--trial', type=int, help='trial number, as recorded in the results')
+    action.add_argument('--practice', type=int, help='practice trial number, from 1')
+    action.add_argument('--check', action='store_true', help='replay every trial recorded and compare')
+    options = parser.parse_args()
+
+    participantId, name, seed, config = loadSession(options.database, options.participant)
+    rows = recordedTrials(options.database, participantId)
+    replayer = Replayer(seed, config, [row[4:] for row in rows])
+    if options.check:
+        start = time.perf_counter()
+        mismatches = checkSession(replayer, rows)
+        elapsed = time.perf_counter() - start
+        print('{0} (participant {1}, seed {2}): {3} trials replayed, {4:.0f} us per trial, {5}'.format(
+            name, participantId, seed, len(rows), elapsed / max(len(rows), 1) * 1e6,
+            'all match' if not mismatches else 'trials not matching: ' + ', '.join(map(str, mismatches))))
+    else:
+        number = replayer.sessionNumber(options.trial if options.trial is not None else options.practice,
+                                        options.trial is None)
+        printTrial(replayer, replayer.trial(number), number)
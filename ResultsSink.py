@@ -0,0 +1,120 @@
+""" This module writes the results files from a background thread, so that disk access never delays the trials.
+Lines are queued by the experiment and written in batches; a file is synced to disk at the end of each block and when
+it is closed. A line left incomplete by an interrupted session is removed when the file is opened again."""
+
+import os
+import queue
+import threading
+from abc import ABC, abstractmethod
+
+FLUSH = object()  # queue markers, anything else in the queue is data to write
+SYNC = object()
+CLOSE = object()
+
+
+def repairTail(path):  # removes a last line cut off by a crash, returns True if the file already existed
+    if not os.path.exists(path):
+        return False
+    with open(path, 'rb+') as file:
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:  # looks for the last newline, reading the end of the file backwards
+            start = max(0, position - 4096)
+            file.seek(start)
+            chunk = file.read(position - start)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            file.truncate(position)
+    return True
+
+
+class BackgroundWriter(ABC):  # queue emptied in batches by a writer thread, subclasses say how a batch is written
+    def __init__(self, name):
+        self.queue = queue.Queue()
+        self.error = None  # exception raised by the writer thread, raised again in the experiment
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    def put(self, item):  # returns straight away, the item is written by the thread
+        self.check()
+        self.queue.put(item)
+
+    def flush(self):  # hands what was written to the operating system
+        self.queue.put(FLUSH)
+
+    def sync(self):  # what was written so far reaches the disk, e.g. at the end of a block
+        self.queue.put(SYNC)
+
+    def close(self):  # writes everything left, syncs and waits for the thread to finish
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(CLOSE)
+        self.thread.join()
+        self.check()
+
+    def run(self):
+        try:
+            self.openTarget()  # in the thread, some connections can only be used where they were opened
+        except Exception as error:
+            self.error = error
+            return
+        running = True
+        while running:
+            batch = [self.queue.get()]  # waits for something to do
+            while True:  # group everything queued in the meantime into a single write
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            items = [item for item in batch if item is not FLUSH and item is not SYNC and item is not CLOSE]
+            running = not any(item is CLOSE for item in batch)
+            sync = any(item is SYNC for item in batch)
+            try:
+                self.writeBatch(items, sync or not running)
+                if not running:
+                    self.closeTarget()
+            except Exception as error:
+                self.error = error
+
+    def openTarget(self):
+        pass
+
+    @abstractmethod
+    def writeBatch(self, items, sync):  # items queued since the last batch, synced to disk if sync
+        pass
+
+    def closeTarget(self):
+        pass
+
+
+class ResultsSink(BackgroundWriter):  # text file written line by line
+    def __init__(self, path, header=''):
+        repairTail(path)
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8', newline='')
+        if header and self.file.tell() == 0:  # empty file, column names first
+            self.file.write(header)
+        super().__init__('ResultsSink ' + path)
+
+    def write(self, text):  # same use as a file, but returns straight away
+        self.put(text)
+
+    def writeBatch(self, lines, sync):
+        if lines:
+            self.file.write(''.join(lines))
+            self.file.flush()  # every batch reaches the operating system, a crashed program loses nothing
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def closeTarget(self):
+        self.file.close()
@@ -0,0 +1,128 @@
+""" This module stores the results in an SQLite database: one row per participant and one row per trial, indexed by
+participant and by condition (time between the targets, distance). The database is written from a background thread
+in WAL mode, and can be exported to the .csv format of the original experiment.
+
+python ResultsStore.py attentionalBlink.db --csv attentionalBlink.csv     exports all the trials to a .csv file
+"""
+
+import argparse
+import csv
+import sqlite3
+import time
+
+from ResultsSink import BackgroundWriter
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS participants (
+    participantId INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    age INTEGER,
+    gender INTEGER,
+    education TEXT,
+    email TEXT,
+    sessionStart TEXT NOT NULL,
+    seed INTEGER,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS trials (
+    participantId INTEGER NOT NULL REFERENCES participants(participantId),
+    trialNo INTEGER NOT NULL,
+    diffTime REAL NOT NULL,
+    distanceSides INTEGER NOT NULL,
+    distanceUnits REAL NOT NULL,
+    outcome1 INTEGER NOT NULL,
+    outcome2 INTEGER NOT NULL,
+    rt1 REAL,
+    rt2 REAL,
+    PRIMARY KEY (participantId, trialNo)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trialsCondition ON trials (diffTime, distanceSides);
+'''
+
+# as written by the original experiment, plus the response times
+CSV_HEADER = ['Name', ' Age', ' Gender', ' Education', ' Email', ' Trial no', ' Time(s)', ' Distance(sides)',
+              ' Distance(ui units)', ' Outcome 1', ' Outcome 2', ' RT 1(ms)', ' RT 2(ms)', '']
+
+TRIAL_COLUMNS = ['trialNo', 'diffTime', 'distanceSides', 'distanceUnits', 'outcome1', 'outcome2', 'rt1', 'rt2']
+
+INSERT_TRIAL = 'INSERT OR REPLACE INTO trials (participantId, {0}) VALUES (?{1})'.format(
+    ', '.join(TRIAL_COLUMNS), ', ?' * len(TRIAL_COLUMNS))
+
+# columns missing from databases created by earlier versions
+ADDED_COLUMNS = {'trials': {'rt1': 'REAL', 'rt2': 'REAL'}, 'participants': {'seed': 'INTEGER', 'config': 'TEXT'}}
+# columns renamed since, lag held the T1-T2 time in seconds where lag is a number of frames everywhere else
+RENAMED_COLUMNS = {'trials': {'lag': 'diffTime'}}
+
+
+def connect(path):  # opens the database, creating the tables the first time
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode=WAL')    # readers never block the experiment writing
+    connection.execute('PRAGMA synchronous=NORMAL')  # commits only wait for the disk at checkpoints
+    for table, columns in RENAMED_COLUMNS.items():  # before the schema, whose index uses the new names
+        existing = {row[1] for row in connection.execute('PRAGMA table_info({0})'.format(table))}
+        for old, new in columns.items():
+            if old in existing:
+                connection.execute('ALTER TABLE {0} RENAME COLUMN {1} TO {2}'.format(table, old, new))
+    connection.executescript(SCHEMA)
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row[1] for row in connection.execute('PRAGMA table_info({0})'.format(table))}
+        for column, kind in columns.items():
+            if column not in existing:
+                connection.execute('ALTER TABLE {0} ADD COLUMN {1} {2}'.format(table, column, kind))
+    return connection
+
+
+class ResultsStore(BackgroundWriter):
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+        self.participantId = None  # participant the next trials belong to, only used in the writer thread
+        super().__init__('ResultsStore ' + path)
+
+    def openTarget(self):
+        self.connection = connect(self.path)
+
+    def addParticipant(self, name, age, gender, education, email, seed=None, config=None):
+        # the next trials belong to this participant, seed and config (JSON) of their session are kept for Replay.py
+        self.put(('participant', (name, age, gender, education, email, time.strftime('%Y-%m-%d %H:%M:%S'), seed,
+                                  config)))
+
+    def addTrial(self, trialNo, diffTime, distanceSides, distanceUnits, outcome1, outcome2, rt1=None, rt2=None):
+        # diffTime: time between T1 and T2 (seconds), the lag in frames times the frame interval
+        self.put(('trial', (trialNo, diffTime, distanceSides, distanceUnits, outcome1, outcome2, rt1, rt2)))
+
+    def writeBatch(self, items, sync):
+        with self.connection:  # one transaction per batch
+            for kind, row in items:
+                if kind == 'participant':
+                    cursor = self.connection.execute('INSERT INTO participants (name, age, gender, education, email, '
+                                                     'sessionStart, seed, config) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                                     row)
+                    self.participantId = cursor.lastrowid
+                else:
+                    self.connection.execute(INSERT_TRIAL, (self.participantId,) + row)
+        if sync:
+            self.connection.execute('PRAGMA wal_checkpoint(FULL)')
+
+    def closeTarget(self):
+        self.connection.close()
+
+
+def exportCsv(databasePath, csvPath):  # every trial, in the .csv format of the original experiment
+    connection = connect(databasePath)
+    rows = connection.execute('SELECT name, age, gender, education, email, trialNo, diffTime, distanceSides, '
+                              'distanceUnits, outcome1, outcome2, rt1, rt2 FROM trials '
+                              'JOIN participants USING (participantId) ORDER BY participantId, trialNo')
+    with open(csvPath, 'w', encoding='utf-8', newline='') as file:
+        file.write(','.join(CSV_HEADER) + '\n')
+        writer = csv.writer(file, lineterminator='\n')
+        writer.writerows(rows)
+    connection.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('database')
+    parser.add_argument('--csv', required=True, help='.csv file to export the trials to')
+    options = parser.parse_args()
+    exportCsv(options.database, options.csv)
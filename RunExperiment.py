@@ -2,14 +2,15 @@
 
 """ Attentional Blinking in Space and Time: This code reproduces and extends the experiment from
 (Kristjánsson & Nakayama, 2002). It is a visual detection task and requires Qt Designer to run.
-The experimental data is stored in a separate .csv file located in the same folder. Each participant corresponds
-to a single line. """
+The experimental data is stored in an SQLite database located in the same folder (attentionalBlink.db, or --data),
+with one line per participant and one per trial. """
 
 
-from uiStuff import *
-from FunModule import *
-from random import *
-from math import *
+import time
+launched = time.perf_counter()  # startup is timed from here, imports included
+
+from uiStuff import *  # Qt and the consent page only, the rest of the experiment is imported once it is on screen
+import argparse
 
 # Create stimuli
 ui.alphabetList = []
@@ -30,30 +31,78 @@ ui.interval = 140   # time (milliseconds) between each frame
 ui.framesMax = 30   # number of frames per trial
 ui.trialMax = 7     # number of trials per block
 
+# Adaptive design, the conditions go where accuracy is least known and the block stops once it is known well enough
+ui.adaptiveDesign = False  # ui.trialMax is then the most trials of the block
+ui.targetWidth = 0.3       # width of the 95% interval of T2|T1 accuracy the block stops at, in every condition
+ui.minCellTrials = 2       # trials with T1 reported in every condition before stopping
+ui.adaptive = None         # conditions chosen so far, during the main block of an adaptive design
+
 # Set practice trials
 ui.practiceTrial = True     # set to True if you want practice trials, and False if not
 ui.practiceNumber = 1       # set number of practice trials
 
+# Results database, the timing files are named after it
+ui.dataFile = 'attentionalBlink.db'
+ui.timeScale = 1    # multiplies every delay of the experiment, 0 runs a simulation as fast as possible
+
+# Seed of the stimuli, None draws a new one for every participant (it is stored with their results either way)
+ui.seed = None
+
+# Frame timing safeguards
+ui.quietGc = True       # garbage is collected between trials, never during a stream of frames
+ui.stallFraction = 0.5  # main thread stalls longer than this fraction of a frame interval are logged, 0 = not watched
+
+# Kiosk mode, the debrief page goes back to the consent page for the next participant, without restarting
+ui.kiosk = False
+ui.debriefTime = 10000  # time (milliseconds) the debrief page stays on screen in kiosk mode
+
 # Set stimuli
 ui.distractors = ui.alphabetList
 ui.targets = ui.numberList
 
 ########################################################################################################################
 
-# Initialise lists to keep track of conditions and store variables
-ui.positionList = []    # record of difference in position between the two targets
-ui.previousList = []    # previously chosen letters to avoid same letter in the same position two frames in a row
-ui.lagList = []         # record of differences in frame number between targets
-ui.labelsList = []      # list of labels created
-ui.dataList = []        # list of results per participant
-ui.lengths = []         # list of distances between streams of stimuli in units
+# Command line options, e.g. "python RunExperiment.py --headless --trials 1000" simulates a participant
+parser = argparse.ArgumentParser(description='Attentional blink in space and time')
+parser.add_argument('--headless', action='store_true', help='run offscreen with a synthetic participant')
+parser.add_argument('--trials', type=int, help='number of trials per block')
+parser.add_argument('--time-scale', type=float, help='multiplies every delay (0 by default when headless)')
+parser.add_argument('--data', help='results database (attentionalBlink_simulation.db by default when headless)')
+parser.add_argument('--kiosk', action='store_true', help='run one participant after the other in the same process')
+parser.add_argument('--participants', type=int, default=1,
+                    help='synthetic participants run one after the other when headless, kiosk mode if more than 1')
+parser.add_argument('--seed', type=int, help='seed of the stimuli, the same for every participant')
+parser.add_argument('--adaptive', type=float, metavar='WIDTH',
+                    help='choose conditions adaptively and stop once every interval of accuracy is narrower than WIDTH')
+parser.add_argument('--stall-fraction', type=float,
+                    help='log main thread stalls longer than this fraction of the frame interval, 0 to disable')
+parser.add_argument('--profile', metavar='TRACE', default=os.environ.get('AB_PROFILE'),
+                    help='time the functions of the experiment and write a Chrome trace, e.g. profile.json')
+options = parser.parse_known_args()[0]  # Qt options are left to QApplication
+
+if options.headless:
+    ui.timeScale = 0
+    ui.dataFile = 'attentionalBlink_simulation.db'
+if options.trials is not None:
+    ui.trialMax = options.trials
+if options.time_scale is not None:
+    ui.timeScale = options.time_scale
+if options.data is not None:
+    ui.dataFile = options.data
+if options.seed is not None:
+    ui.seed = options.seed
+if options.adaptive is not None:
+    ui.adaptiveDesign = True
+    ui.targetWidth = options.adaptive
+if options.stall_fraction is not None:
+    ui.stallFraction = options.stall_fraction
+if options.kiosk or options.participants > 1:
+    ui.kiosk = True
+
+ui.startup = StartupLog(launched, window)  # time to first paint and to first trial, for the timing report
+ui.startup.mark('imports')
 
 
-# Counters
-ui.trialCount = 0
-ui.frameCount = 0
-ui.answerCount = 0
-
 # Set full screen
 window.showFullScreen()
 ui.swPages.setCurrentIndex(0)
@@ -61,197 +110,253 @@ ui.swPages.setCurrentIndex(0)
 
 # LAYOUT
 # Get window and page dimensions
-ui.pageCentreWidth = ui.swPages.width()/2
+ui.pageCentreWidth = ui.swPages.width()//2
 ui.pageHeight = ui.swPages.height()
-windowWidthC = window.width()/2
-windowHeightC = window.height()/2
+windowWidthC = window.width()//2
+windowHeightC = window.height()//2
 
 # Centre widgets
 # Pages
-pagesGeometry = QRect(windowWidthC - ui.pageCentreWidth, windowHeightC-ui.pageHeight/2, ui.pageCentreWidth*2, ui.pageHeight)
+pagesGeometry = QRect(windowWidthC - ui.pageCentreWidth, windowHeightC-ui.pageHeight//2, ui.pageCentreWidth*2, ui.pageHeight)
 ui.swPages.setGeometry(pagesGeometry)
 
 # Black background box of frames
 boxWidth = ui.radius * 3  # size of box varies with radius
 boxHeight = ui.radius * 3
-boxGeometry = QRect(ui.pageCentreWidth-boxWidth/2, ui.pageHeight/2-boxHeight/2, boxWidth, boxHeight)
-ui.lblBox.setGeometry(boxGeometry)
-ui.lblBox.show()
+boxGeometry = QRect(ui.pageCentreWidth-boxWidth//2, ui.pageHeight//2-boxHeight//2, boxWidth, boxHeight)
 
 # Fixation Point
 ui.sizeFont = QFont()
-ui.sizeFont.setPointSize(36)
-ui.lblFixPoint.setFont(ui.sizeFont)  # Setting font to size 36
-ui.lblFixPoint.setAlignment(Qt.AlignCenter)
-fixWidth = 31
-fixHeight = 41
-fixXaxis = ui.pageCentreWidth - fixWidth/2
-fixYaxis = ui.pageHeight/2 - fixHeight/2
-fixGeometry = QRect(fixXaxis, fixYaxis, fixWidth, fixHeight)
-ui.lblFixPoint.setGeometry(fixGeometry)
+ui.sizeFont.setPointSize(36)  # Setting font to size 36
 
 # Title centre top
 titleWidth = 121
 titleHeight = 16
-titleX = ui.pageCentreWidth - titleWidth/2
+titleX = ui.pageCentreWidth - titleWidth//2
 titleY = titleHeight
 titleGeometry = QRect(titleX, titleY, titleWidth, titleHeight)
-ui.lblConsent.setGeometry(titleGeometry)
-ui.lblDemographics.setGeometry(titleGeometry)
-ui.lblInstructions.setGeometry(titleGeometry)
-ui.lblDebrief.setGeometry(titleGeometry)
-
-ui.lblPractice.move(titleX, ui.lblBox.y()-25)  # use move method if no need to resize
-ui.lblPractice2.move(titleX, ui.lblBox.y()-25)
 
 # Buttons bottom right
 btnGeometry = QRect(600, 450, 90, 30)
-ui.btnConfirm.setGeometry(btnGeometry)
-ui.btnSubmit.setGeometry(btnGeometry)
-ui.btnNext.setGeometry(btnGeometry)
-
 
 # Textboxes centre
 textWidth = 600
 textHeight = 200
-textX = (ui.swPages.width()-textWidth)/2
+textX = (ui.swPages.width()-textWidth)//2
 textY = titleHeight*2 + 10
 textGeometry = QRect(textX, textY, textWidth, textHeight)
-ui.lblTandC.setGeometry(textGeometry)
-ui.wgForm.setGeometry(QRect(textX + ui.swPages.x()/2, textY, textWidth, textHeight))
-ui.lblDescription.setGeometry(textGeometry)
-ui.lblExample.setGeometry(QRect((ui.swPages.width()-180)/2, ui.lblDescription.y()+textHeight+10, 180, 180))
-ui.lblQuestion.setGeometry(textGeometry)
-ui.lblThanks.setGeometry(textGeometry)
-
-# Place answer labels
+
+# Answer labels
 answerX = 200
-ui.lblAnswer1.setGeometry(QRect(answerX,ui.pageHeight/2,titleWidth, titleHeight))  # set relative to page leftx and page right x
-ui.lblErrorDigit.move(answerX+titleWidth, ui.pageHeight/2-titleHeight)
-ui.lblEntry1.setGeometry(QRect(answerX,ui.pageHeight/2+titleHeight,titleWidth, titleHeight))
-ui.lblAnswer2.setGeometry(QRect(ui.swPages.width()-answerX-titleWidth, ui.pageHeight/2, titleWidth, titleHeight))
-positionX=ui.swPages.width()-answerX-titleWidth
-ui.lblEntry2.setGeometry(QRect(positionX, ui.pageHeight/2+titleHeight, titleWidth, titleHeight))
 
 
-#############
-# FUNCTIONAL
-# create .csv summary file in the append mode so previous data entries remain
-ui.data = open('attentionalBlink.csv', 'a')
-readData = open('attentionalBlink.csv', 'r')
-listData = readData.readlines()
+# PAGES
+# Each page is laid out and connected once it is built, see LazyPages.py, the consent page before the window appears
+
+# CONSENT
+def setupConsent():  # ensures the conditions are clear and understood before experiment begins
+    ui.lblConsent.setGeometry(titleGeometry)
+    ui.btnConfirm.setGeometry(btnGeometry)
+    ui.lblTandC.setGeometry(textGeometry)
+    ui.lblError0.hide()
 
-# Write column names
-if len(listData) == 0:
-    ui.data.write('Name, Age, Gender, Education, Email, Trial no, Time(s), Distance(sides), Distance(ui units), '
-                  'Outcome 1, Outcome 2,\n')
 
+ui.onBuild(0, setupConsent)
 
-# List of equidistant labels positioned in a circle around the fixation point
-ui.shift = randint(0, 360)  # selects random float, representing shift degree in radians
-ui.vertices = createPoly(ui.streams, ui.radius, ui.shift)  # choose number of sides, radius, and angle of rotation
 
+# displays UI window, the rest of the experiment is loaded once the consent page is on screen
+ui.startup.watch(ui.pgConsent)
+window.show()
+ui.startup.mark('window shown')
+while 'first paint' not in ui.startup.marks:
+    app.processEvents(QEventLoop.WaitForMoreEvents)
 
-# Create labels
-for i in range(ui.streams):
-    name = "lbl" + str(i)
-    ui.name = QLabel(ui.pgExperiment)
-    ui.name.setFont(ui.sizeFont)
-    ui.name.resize(31, 31)
-    ui.lblHeight = ui.name.height()
-    ui.lblWidth = ui.name.width()
-    ui.name.setAlignment(Qt.AlignCenter)
-    ui.name.show()
-    ui.labelsList.append(ui.name)  # list of labels so they are accessible
+from FunModule import *
+from FrameScheduler import *
+from TimingLog import *
+from TrialState import *
+from TrialPipeline import *
+from KeyboardWidget import *
+from ResultsSink import *
+from StimulusArchive import *
+from ResultsStore import *
+from StallWatchdog import *
+from random import *
+from math import *
+ui.startup.mark('modules loaded')  # numpy, the results files and every other part of the experiment
 
+ui.symbols = buildSymbols(ui.distractors, ui.targets)  # symbols displayed in the streams, coded by their index
 
-# List of numbers to choose targets and frames where they appear from
+# Functions timed when profiling, every one of them is called from a timer or a signal
+PROFILED = ['startTrial', 'prepareTrial', 'showStimuli', 'showFrame', 'pickDistractors', 'endTrial', 'labelHide',
+            'showAnswerPage', 'getAnswer', 'showAnswer', 'scoreAnswers', 'checkAnswer', 'storeData', 'storeStimuli',
+            'newTrial', 'endSession', 'resetSession']
+ui.profiler = None
+if options.profile:  # wrapped before anything is connected to them, see Profiler.py
+    import FunModule
+    from Profiler import Profiler
+    ui.profiler = Profiler(lambda: ui.session.trialCount, lambda lane: 'trial {0}'.format(lane) if lane else 'session')
 
+    def frameLateness(start):  # how late the callback of a frame started, compared to the deadline of the frame
+        frame = ui.frameScheduler.frame
+        return {'frame': frame, 'lateMs': (start - ui.frameScheduler.deadline(frame)) / 1000000}
+    ui.profiler.instrument([vars(FunModule), globals()], PROFILED, {'showFrame': frameLateness})
 
-# CONSENT
-# Ensures the conditions are clear and understood before experiment begins
-ui.btnConfirm.clicked.connect(consentCheck)
+# State of the session and of the current trial
+ui.session = SessionState(ui.framesMax, ui.streams)
+ui.trial = ui.session.trial
+
+
+#############
+# FUNCTIONAL
+# Results database, previous participants remain, written from a background thread
+ui.results = ResultsStore(ui.dataFile)
 
+# Sidecar file with the onset of every frame, and report of the frame timing of each session
+dataName = os.path.splitext(ui.dataFile)[0]
+ui.timingData = ResultsSink(dataName + '_timing.csv', 'Trial no,Practice,Event,Frame,Onset(ms),Deadline(ms)\n')
+ui.timingReport = ResultsSink(dataName + '_timing_report.txt')
+ui.timingLog = TimingLog(ui.framesMax, ui.interval * ui.timeScale, ui.timingData)
 
-# HIDING and SHOWING
-# Hide all stimuli
-labelHide()
+# Archive of the symbols of every frame and stream of every trial, read with StimulusArchive.loadArchive
+ui.stimulusArchive = StimulusArchive(archivePath(dataName, ui.framesMax, ui.streams), ui.framesMax, ui.streams,
+                                     ui.symbols)
 
-# Display practice title depending on boolean
-ui.lblPractice.hide()
-ui.lblPractice2.hide()
+# Watchdog thread logging the stalls of the main thread to the timing report, with where they happened
+ui.watchdog = None
+if ui.stallFraction * ui.interval * ui.timeScale > 0:
+    ui.watchdog = StallWatchdog(ui.stallFraction * ui.interval * ui.timeScale,
+                                lambda: 'trial {0}, frame {1} ({2})'.format(ui.session.trialCount, ui.trial.frameCount,
+                                                                            ui.pipeline.state),
+                                ui.timingReport, window)
+    ui.watchdog.start()
+    app.aboutToQuit.connect(ui.watchdog.stop)
 
+app.aboutToQuit.connect(closeFiles)  # everything queued is written and synced before leaving
 
+if ui.profiler:
+    ui.timingLog.endTrial = ui.profiler.wrap('writeTiming', ui.timingLog.endTrial)  # the sidecar file of the frames
+    app.aboutToQuit.connect(lambda: ui.profiler.save(options.profile))
+    app.aboutToQuit.connect(lambda: print(ui.profiler.summary(), end=''))
 
-# Hide all specific error labels
-ui.lblErrorName.hide()
-ui.lblErrorGender.hide()
-ui.lblErrorEduc.hide()
-ui.lblErrorAge.hide()
-ui.lblErrorEmail.hide()
-ui.lblErrorDigit.hide()
-ui.lblError0.hide()
+
+# Equidistant streams positioned in a circle around the fixation point, with the distances between all of them
+ui.trial.shift = randint(0, 360)  # selects random float, representing shift degree
+ui.layout = buildLayout(ui.streams, ui.radius, ui.trial.shift)  # choose number of sides, radius, and angle of rotation
+
+# Timer presenting the frames of every trial
+ui.frameScheduler = FrameScheduler(window)
+ui.pipeline = TrialPipeline(window, ui.timeScale)  # timers of the steps of the trials
+
+
+# OTHER PAGES
+ui.btnConfirm.clicked.connect(consentCheck)  # the consent page was laid out before the window appeared
 
 
 # DEMOGRAPHICS
-ui.btnSubmit.clicked.connect(errorCheck)
+def setupDemographics():
+    ui.lblDemographics.setGeometry(titleGeometry)
+    ui.btnSubmit.setGeometry(btnGeometry)
+    ui.wgForm.setGeometry(QRect(textX + ui.swPages.x()//2, textY, textWidth, textHeight))
+
+    # Hide all specific error labels
+    ui.lblErrorName.hide()
+    ui.lblErrorGender.hide()
+    ui.lblErrorEduc.hide()
+    ui.lblErrorAge.hide()
+    ui.lblErrorEmail.hide()
+    ui.errorTexts = {label: label.text() for label in (ui.lblErrorAge, ui.lblErrorEmail)}  # as in DesignerFile.ui
+    ui.btnSubmit.clicked.connect(errorCheck)
 
 
 # INSTRUCTIONS
-# Adapt on screen instructions to the particular conditions of the experiment
-description = "In each trial, you will be shown {0} consecutive frames with {1} elements " \
-              "placed in a circle around the fixation dot, as seen in the image below:\n\n" \
-              "In every trial, there will be 2 random frames which contain one number. " \
-              "The aim is for you to remember the numbers hidden among the letters " \
-              "and input them at the end of each trial."
+def setupInstructions():  # adapt on screen instructions to the particular conditions of the experiment
+    ui.lblInstructions.setGeometry(titleGeometry)
+    ui.btnNext.setGeometry(btnGeometry)
+    ui.lblDescription.setGeometry(textGeometry)
+    ui.lblExample.setGeometry(QRect((ui.swPages.width()-180)//2, ui.lblDescription.y()+textHeight+10, 180, 180))
+
+    description = "In each trial, you will be shown {0} consecutive frames with {1} elements " \
+                  "placed in a circle around the fixation dot, as seen in the image below:\n\n" \
+                  "In every trial, there will be 2 random frames which contain one number. " \
+                  "The aim is for you to remember the numbers hidden among the letters " \
+                  "and input them at the end of each trial."
+
+    # Append practice trial instructions if they are happening
+    if ui.practiceTrial is True:
+        pracDescription = "\nYou will get {2} practice trial(s) at the beginning, where your results will not be " \
+                          "recorded"
+        description += pracDescription
+        ui.lblDescription.setText(description.format(ui.framesMax, ui.streams, ui.practiceNumber))
+    else:
+        ui.lblDescription.setText(description.format(ui.framesMax, ui.streams))
+
+    ui.btnNext.clicked.connect(nextPage)
+    ui.btnNext.clicked.connect(startTrial)  # triggers connected functions which run the whole experiment
 
-# Append practice trial instructions if they are happening
-if ui.practiceTrial is True:
-    pracDescription = "\nYou will get {2} practice trial(s) at the beginning, where your results will not be recorded"
-    description += pracDescription
-    ui.lblDescription.setText(description.format(ui.framesMax, ui.streams, ui.practiceNumber))
-else:
-    ui.lblDescription.setText(description.format(ui.framesMax, ui.streams))
 
-ui.btnNext.clicked.connect(nextPage)
+# EXPERIMENT
+def setupExperiment():
+    from StimulusCanvas import StimulusCanvas  # its glyphs are only drawn once the page is built
+    ui.lblBox.setGeometry(boxGeometry)
+    ui.lblBox.show()
+    ui.lblFixPoint.hide()  # the fixation cross is drawn with the stimuli by the canvas
+    ui.lblPractice2.move(titleX, boxGeometry.y()-25)  # use move method if no need to resize
 
+    # Create the canvas drawing the fixation cross and all the streams, on top of the black box
+    ui.canvas = StimulusCanvas(ui.pgExperiment, ui.symbols, len(ui.distractors), ui.sizeFont)
+    ui.canvas.setGeometry(0, 0, int(ui.pageCentreWidth*2), int(ui.pageHeight))
+    ui.canvas.setPositions(ui.layout.vertices, ui.pageCentreWidth, ui.pageHeight/2)
+    ui.canvas.timingLog = ui.timingLog
+    ui.canvas.show()
 
-# EXPERIMENT
-ui.btnNext.clicked.connect(startTrial)  # triggers connected functions which run the whole experiment
+    # Hide all stimuli, and the practice title until a practice trial
+    labelHide()
+    ui.lblPractice2.hide()
 
 
 # ANSWERS
-ui.entriesList = [ui.lblEntry1, ui.lblEntry2]
+def setupAnswers():
+    ui.lblPractice.move(titleX, boxGeometry.y()-25)
+    ui.lblQuestion.setGeometry(textGeometry)
 
-ui.lblEntry1.hide()
-ui.lblEntry2.hide()
+    # Place answer labels, set relative to page left x and page right x
+    ui.lblAnswer1.setGeometry(QRect(answerX, ui.pageHeight//2, titleWidth, titleHeight))
+    ui.lblErrorDigit.move(answerX+titleWidth, ui.pageHeight//2-titleHeight)
+    ui.lblEntry1.setGeometry(QRect(answerX, ui.pageHeight//2+titleHeight, titleWidth, titleHeight))
+    positionX = ui.swPages.width()-answerX-titleWidth
+    ui.lblAnswer2.setGeometry(QRect(positionX, ui.pageHeight//2, titleWidth, titleHeight))
+    ui.lblEntry2.setGeometry(QRect(positionX, ui.pageHeight//2+titleHeight, titleWidth, titleHeight))
 
+    ui.entriesList = [ui.lblEntry1, ui.lblEntry2]
+    ui.lblEntry1.hide()
+    ui.lblEntry2.hide()
+    ui.lblErrorDigit.hide()
+    ui.lblPractice.hide()
 
-# Create widget that is keyboard-sensitive for participant to type in answer
-class KeyboardWidget (QWidget):
-    keyPressed = pyqtSignal(str)
+    # Create widget that is keyboard-sensitive for participant to type in answer, and times the key presses
+    ui.myWidget = KeyboardWidget(ui.pgAnswer)
+    ui.myWidget.setGeometry(40, 40, 500, 500)
+    ui.myWidget.keyPressed.connect(getAnswer)
+    ui.myWidget.painted.connect(ui.timingLog.stampAnswerPage)  # response times count from the page on screen
 
-    def keyPressEvent(self, keyEvent):
-        self.keyPressed.emit(keyEvent.text())
 
+# END
+def setupEnd():
+    ui.lblDebrief.setGeometry(titleGeometry)
+    ui.lblThanks.setGeometry(textGeometry)
 
-ui.myWidget = KeyboardWidget(ui.pgAnswer)
-ui.myWidget.setGeometry(40, 40, 500, 500)
-ui.myWidget.keyPressed.connect(getAnswer)
 
+for index, setup in enumerate([setupDemographics, setupInstructions, setupExperiment, setupAnswers, setupEnd], 1):
+    ui.onBuild(index, setup)
+ui.onBuild(len(ui.pages) - 1, freezeHeap)  # the last page is built last, what the startup left is collected once
 
-# DATA COLLECTION
-# Calculate distance between vertice 0 and all the remaining vertices in the polygon
-for i in range(len(ui.vertices)):
-    x0 = ui.vertices[0][0]
-    y0 = ui.vertices[0][1]
-    xi = ui.vertices[i][0]
-    yi = ui.vertices[i][1]
-    length = hypot(xi-x0, yi-y0)    # distance is the hypotenuse between positions
-    ui.lengths.append(length)       # stores the lengths between all vertices
 
+# the other pages are built in idle time
+ui.buildWhenIdle()
 
-# displays UI window
-window.show()
+if options.headless:  # nobody in front of the screen, a synthetic participant goes through the experiment
+    from Observer import BlinkObserver
+    QTimer.singleShot(0, lambda: startSimulation(BlinkObserver(), options.participants))
 
-sys.exit(app.exec_())
\ No newline at end of file
+sys.exit(app.exec_())
@@ -0,0 +1,43 @@
+""" This module builds the whole frame-by-frame stimulus schedule of a trial before it is presented, so that
+no random sampling happens while the frames are on screen."""
+
+import numpy as np
+
+defaultRng = np.random.default_rng()  # used whenever no generator is passed in
+
+
+def buildSymbols(distractors, targets):  # symbol table of the experiment, the index of a symbol is its code
+    symbols = [str(distractor) for distractor in distractors] + [str(target) for target in targets]
+    if len(symbols) > 256:
+        raise ValueError("at most 256 distractors and targets can be coded on uint8")
+    return symbols
+
+
+def targetCode(target, distractors, targets):  # code of a target digit in the symbol table
+    return len(distractors) + targets.index(target)
+
+
+def buildSchedule(framesMax, streams, nDistractors, frameT1, frameT2, index1, index2, codeT1, codeT2, rng=None):
+    """ Returns a framesMax x streams uint8 grid of symbol codes, row f being displayed on frame f+1.
+    Distractors differ between streams of a same frame (when there are enough of them) and a stream never shows
+    the same letter on two consecutive frames. T1 and T2 are placed on their frame and stream."""
+    if rng is None:
+        rng = defaultRng
+
+    if streams <= nDistractors:
+        # the streams walk the same random cycle of the distractors, every frame by the same step of 1 to n-1: the
+        # letters of a frame stay distinct, and no stream lands on the letter it has just shown
+        cycle = rng.permutation(nDistractors).astype(np.uint8)
+        start = rng.permutation(nDistractors)[:streams]
+        steps = rng.integers(1, nDistractors, size=framesMax)
+        steps[0] = 0
+        grid = cycle[(start + np.cumsum(steps)[:, None]) % nDistractors]
+    else:
+        # not enough letters to fill a frame without duplicates, only keep the no-repeat rule per stream
+        steps = rng.integers(1, nDistractors, size=(framesMax, streams))
+        steps[0] = rng.integers(0, nDistractors, size=streams)
+        grid = (np.cumsum(steps, axis=0) % nDistractors).astype(np.uint8)
+
+    grid[frameT1-1, index1] = codeT1  # frames are counted from 1 in the trial
+    grid[frameT2-1, index2] = codeT2
+    return grid
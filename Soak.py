@@ -0,0 +1,135 @@
+""" Soak test of the experiment: the real trial cycle of FunModule (pages, canvas, pipeline, frame scheduler, results
+files) runs offscreen for thousands of trials with a synthetic participant. Every N trials, the memory allocated by
+Python (tracemalloc) and the percentiles of the tick latency of the frames (time from when a frame was due, or from
+when its timer was armed if it was already due, to its callback) are reported. The run fails if memory grew by more
+than its budget between the first checkpoint (after the warm-up) and the last one, or if the p99 tick latency grew
+beyond both of its budgets, absolute and relative. A single checkpoint can be slow from scheduler noise alone, so the
+latency compares the median p99 of the later half of the checkpoints with that of the early half.
+
+python Soak.py                                        10000 trials, a checkpoint every 500
+python Soak.py --trials 20000 --every 1000 --memory-budget 1 --latency-budget 0.5 --latency-growth 0.2
+"""
+
+import os
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import argparse
+import runpy
+import sys
+import tempfile
+import tracemalloc
+
+import numpy as np
+from time import perf_counter_ns
+
+import FrameScheduler
+import FunModule
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+class Soak:  # hooks into the frame scheduler and the trial cycle, and keeps the checkpoints
+    def __init__(self, every, top):
+        self.every = every
+        self.top = top          # allocation sites listed with the growth of memory
+        self.latencies = []     # tick latencies (ms) since the last checkpoint
+        self.checkpoints = []   # (trials, memory (bytes), p50, p95, p99, max tick latency (ms), QTimers alive)
+        self.baseline = None    # tracemalloc snapshot of the first checkpoint
+        self.growth = []        # largest growing allocation sites at the last checkpoint
+
+    def install(self):  # before RunExperiment creates the frame scheduler, and before it schedules any trial
+        arm = FrameScheduler.FrameScheduler.arm
+        tick = FrameScheduler.FrameScheduler.tick
+        soak = self
+
+        def armed(scheduler):
+            scheduler.due = max(perf_counter_ns(), scheduler.deadline(scheduler.frame + 1))
+            arm(scheduler)
+
+        def ticked(scheduler):
+            soak.latencies.append((perf_counter_ns() - scheduler.due) / 1000000)
+            tick(scheduler)
+        FrameScheduler.FrameScheduler.arm = armed
+        FrameScheduler.FrameScheduler.tick = ticked
+
+        newTrial = FunModule.newTrial
+
+        def checkedTrial():  # between two trials, nothing else is running
+            if FunModule.ui.session.trialCount % self.every == 0:
+                self.checkpoint(FunModule.ui.session.trialCount)
+            newTrial()
+        FunModule.newTrial = checkedTrial
+
+    def checkpoint(self, trials):
+        latencies = np.array(self.latencies)
+        self.latencies = []
+        ticks = tuple(np.percentile(latencies, [50, 95, 99])) + (latencies.max(),)  # before the snapshot
+        timers = len(FunModule.window.findChildren(FunModule.QTimer))
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        memory = sum(statistic.size for statistic in snapshot.statistics('filename'))
+        self.checkpoints.append((trials, memory) + ticks + (timers,))
+        if self.baseline is None:
+            self.baseline = snapshot
+        else:
+            self.growth = snapshot.compare_to(self.baseline, 'lineno')[:self.top]
+        print('{0:>8}{1:>14.1f}{2:>10.3f}{3:>10.3f}{4:>10.3f}{5:>10.3f}{6:>8}'.format(
+            trials, memory / 1024, *self.checkpoints[-1][2:]), flush=True)
+
+    def check(self, memoryBudget, latencyBudget, latencyGrowth):  # failures, compared with the early checkpoints
+        if len(self.checkpoints) < 2:
+            return ['fewer than two checkpoints, run more trials or check more often']
+        first, last = self.checkpoints[0], self.checkpoints[-1]
+        failures = []
+        memoryGrowth = (last[1] - first[1]) / 1024 / 1024
+        if memoryGrowth > memoryBudget:
+            failures.append('memory grew by {0:.2f} MB, budget {1} MB'.format(memoryGrowth, memoryBudget))
+        half = len(self.checkpoints) // 2  # the middle checkpoint of an odd number is in neither half
+        early = float(np.median([checkpoint[4] for checkpoint in self.checkpoints[:half]]))
+        later = float(np.median([checkpoint[4] for checkpoint in self.checkpoints[-half:]]))
+        if later - early > latencyBudget and later > early * (1 + latencyGrowth):
+            failures.append('median p99 tick latency grew from {0:.3f} ms to {1:.3f} ms (early and later half of the '
+                            'checkpoints), budget {2} ms and {3:.0%}'.format(early, later, latencyBudget,
+                                                                             latencyGrowth))
+        return failures
+
+
+def run(trials, every, top, timeScale):
+    soak = Soak(every, top)
+    soak.install()
+    with tempfile.TemporaryDirectory() as folder:
+        sys.argv = [os.path.join(FOLDER, 'RunExperiment.py'), '--headless', '--trials', str(trials),
+                    '--time-scale', str(timeScale), '--data', os.path.join(folder, 'soak.db')]
+        print('{0:>8}{1:>14}{2:>10}{3:>10}{4:>10}{5:>10}{6:>8}'.format('trials', 'memory (KB)', 'p50 (ms)', 'p95 (ms)',
+                                                                     'p99 (ms)', 'max (ms)', 'timers'))
+        tracemalloc.start()
+        try:
+            runpy.run_path(sys.argv[0], run_name='__main__')
+        except SystemExit:  # the experiment leaves through sys.exit once the session is over
+            pass
+        tracemalloc.stop()
+    return soak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trials', type=int, default=10000)
+    parser.add_argument('--every', type=int, default=500, help='trials between checkpoints, the first is the warm-up')
+    parser.add_argument('--memory-budget', type=float, default=2, help='MB of growth allowed')
+    parser.add_argument('--latency-budget', type=float, default=1, help='ms of growth of the p99 tick latency allowed')
+    parser.add_argument('--latency-growth', type=float, default=0.5,
+                        help='relative growth of the p99 tick latency allowed, 0.5 = 50%%')
+    parser.add_argument('--time-scale', type=float, default=0, help='multiplies every delay of the experiment')
+    parser.add_argument('--top', type=int, default=10, help='allocation sites listed with the memory growth')
+    options = parser.parse_args()
+
+    soak = run(options.trials, options.every, options.top, options.time_scale)
+    if soak.growth:
+        print('\nLargest growth since the first checkpoint:')
+        for statistic in soak.growth:
+            print(statistic)
+    failures = soak.check(options.memory_budget, options.latency_budget, options.latency_growth)
+    for failure in failures:
+        print('FAIL: ' + failure)
+    if failures:
+        raise SystemExit(1)
+    print('OK')
@@ -0,0 +1,68 @@
+""" This module watches the main thread from a thread of its own. A timer on the main thread beats every few
+milliseconds; when no beat came for longer than the threshold (a fraction of the frame interval), the main thread is
+stalled: a blocking write, a garbage collection or a slow callback would make the current frame late. The stall is
+logged once it is over, with how long it lasted, the trial and frame it happened in, and the stack of the main thread
+sampled while it was stalled."""
+
+import sys
+import threading
+import traceback
+
+from PyQt5.QtCore import *
+from time import perf_counter_ns
+
+
+class StallWatchdog(QObject):
+    def __init__(self, threshold, context, file, parent=None):
+        super().__init__(parent)
+        self.threshold = int(threshold * 1000000)     # ns without a beat before the main thread counts as stalled
+        self.period = max(1, int(threshold // 4))     # ms between beats, the beats are late by a stall only
+        self.context = context  # describes where the experiment is, e.g. 'trial 3, frame 12 (stimuli)'
+        self.file = file        # log of the stalls, written to from the watchdog thread
+        self.mainThread = threading.get_ident()
+        self.beat = perf_counter_ns()
+        self.stalls = []        # duration (ms) of every stall of the session
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.heartbeat)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.watch, name='StallWatchdog', daemon=True)
+
+    def start(self):
+        self.beat = perf_counter_ns()
+        self.timer.start(self.period)
+        self.thread.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.stopped.set()
+        self.thread.join()
+
+    def reset(self):  # new session
+        self.stalls = []
+
+    def heartbeat(self):  # main thread
+        self.beat = perf_counter_ns()
+
+    def sample(self):  # stack of the main thread, from the watchdog thread
+        frame = sys._current_frames().get(self.mainThread)
+        return ''.join(traceback.format_stack(frame)) if frame is not None else ''
+
+    def watch(self):  # watchdog thread
+        stalled = None  # beat the stall started from, where it happened and what the main thread was doing
+        while not self.stopped.wait(self.period / 1000):
+            beat = self.beat
+            if stalled is None and perf_counter_ns() - beat > self.threshold:
+                stalled = (beat, self.context(), self.sample())
+            elif stalled is not None and beat != stalled[0]:  # the main thread is back
+                start, where, stack = stalled
+                duration = (beat - start) / 1000000
+                self.stalls.append(duration)
+                self.file.write('Stall of {0:.1f} ms, {1}, main thread was at:\n{2}'.format(duration, where, stack))
+                stalled = None
+
+    def report(self):  # summary of the stalls of the session
+        if not self.stalls:
+            return 'Main loop stalls (> {0:.1f} ms): 0\n'.format(self.threshold / 1000000)
+        return 'Main loop stalls (> {0:.1f} ms): {1}, longest {2:.1f} ms\n'.format(
+            self.threshold / 1000000, len(self.stalls), max(self.stalls))
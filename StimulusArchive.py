@@ -0,0 +1,105 @@
+""" This module archives the stimuli of every trial: the symbol code of every frame and stream, the rotation of the
+polygon, and the targets with their frames and streams. The archive is a binary file of fixed-size records after a
+header, appended to from a writer thread (see ResultsSink.py), every trial as one contiguous record. The header is a
+JSON description of the records, so the archive is read as a NumPy memmap without parsing anything:
+
+    records, header = loadArchive('attentionalBlink_stimuli_30x7.bin')
+    grids = records['schedule'][records['seed'] == seed]     # framesMax x streams codes of every trial of a session
+    letters = np.array(header['symbols'])[grids]              # codes to symbols
+
+The shape of the records depends on the numbers of frames and streams, which are part of the file name. A record cut
+off by a crash is removed when the archive is opened again, and an archive written with other symbols is not appended
+to."""
+
+import json
+import os
+
+import numpy as np
+
+from ResultsSink import BackgroundWriter
+
+MAGIC = b'ABSTIM1\n'
+HEADER_SIZE = 4096  # bytes before the first record, the JSON header is padded with spaces
+
+
+def recordType(framesMax, streams):  # one trial; seed and trial number link it to the results of the session
+    return np.dtype([('seed', '<i8'), ('session', '<i4'), ('trial', '<i4'), ('trialNo', '<i4'), ('practice', 'u1'),
+                     ('T1', 'u1'), ('T2', 'u1'), ('stream1', 'u1'), ('stream2', 'u1'), ('frameT1', '<i2'),
+                     ('frameT2', '<i2'), ('shift', '<i2'), ('schedule', 'u1', (framesMax, streams))])
+
+
+def archivePath(dataName, framesMax, streams):
+    return '{0}_stimuli_{1}x{2}.bin'.format(dataName, framesMax, streams)
+
+
+def readHeader(file):
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError('{0} is not a stimulus archive'.format(file.name))
+    return json.loads(file.read(HEADER_SIZE - len(MAGIC)))
+
+
+def loadArchive(path, mode='r'):  # records as a memmap (empty array if there are none), and header
+    with open(path, 'rb') as file:
+        header = readHeader(file)
+    dtype = recordType(header['framesMax'], header['streams'])
+    count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=dtype), header
+    return np.memmap(path, dtype=dtype, mode=mode, offset=HEADER_SIZE, shape=(count,)), header
+
+
+class StimulusArchive(BackgroundWriter):
+    def __init__(self, path, framesMax, streams, symbols):
+        self.path = path
+        self.record = np.zeros((), dtype=recordType(framesMax, streams))  # filled for every trial, nothing allocated
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                header = readHeader(file)
+            if (header['framesMax'], header['streams'], header['symbols']) != (framesMax, streams, list(symbols)):
+                raise ValueError('{0} was written with other frames, streams or symbols, the codes of its records '
+                                 'would not mean the same symbols: move it or use another --data'.format(path))
+            size = os.path.getsize(path)
+            whole = HEADER_SIZE + (size - HEADER_SIZE) // self.record.itemsize * self.record.itemsize
+            if whole != size:  # record cut off by a crash
+                os.truncate(path, whole)
+            records = loadArchive(path)[0]
+            self.session = int(records['session'][-1]) if len(records) else 0  # sessions already in the archive
+            del records
+            self.file = open(path, 'ab')
+        else:
+            header = json.dumps({'framesMax': framesMax, 'streams': streams, 'symbols': symbols,
+                                 'recordSize': self.record.itemsize}).encode()
+            if len(MAGIC) + len(header) > HEADER_SIZE:  # the first record would overwrite the end of the header
+                raise ValueError('header of {0} is {1} bytes, more than {2}'.format(path, len(MAGIC) + len(header),
+                                                                                 HEADER_SIZE))
+            self.session = 0
+            self.file = open(path, 'ab')
+            self.file.write(MAGIC + header.ljust(HEADER_SIZE - len(MAGIC)))
+        super().__init__('StimulusArchive ' + path)
+
+    def startSession(self, seed):  # the next trials belong to a new session
+        self.session += 1
+        self.record['seed'] = seed
+        self.record['session'] = self.session
+
+    def addTrial(self, trial, number, trialNo, practice):  # number in the session, practice included, trialNo as stored
+        record = self.record
+        record['trial'] = number
+        record['trialNo'] = trialNo
+        record['practice'] = practice
+        record['T1'], record['T2'] = trial.T1, trial.T2
+        record['stream1'], record['stream2'] = trial.index1, trial.index2
+        record['frameT1'], record['frameT2'] = trial.frameT1, trial.frameT2
+        record['shift'] = trial.shift
+        record['schedule'] = trial.schedule
+        self.put(record.tobytes())
+
+    def writeBatch(self, records, sync):
+        if records:
+            self.file.write(b''.join(records))
+            self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def closeTarget(self):
+        self.file.close()
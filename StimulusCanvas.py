@@ -0,0 +1,75 @@
+""" This module contains the widget drawing the fixation cross and the streams of stimuli of the experiment page.
+Every symbol is rendered once into a glyph atlas, so showing a frame only copies a few pixmaps."""
+
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+
+
+class StimulusCanvas(QWidget):
+    distractorColour = QColor('lightGray')
+    targetColour = QColor('white')  # brightness of targets is higher than distractors
+    fixationColour = QColor(230, 230, 230)
+
+    def __init__(self, parent, symbols, nDistractors, font):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)  # the canvas is only drawn on, never clicked
+        self.symbols = symbols
+        self.nDistractors = nDistractors  # codes from this index onwards are targets
+        self.glyphFont = font
+        self.cellSize = max(31, QFontMetrics(font).height())  # large enough for any glyph of the font
+        self.points = []     # top left corner of every stream, set once per trial
+        self.fixationPoint = QPoint()
+        self.frame = None    # row of symbol codes currently displayed, None shows the fixation cross only
+        self.frameNumber = 0
+        self.timingLog = None  # records when each frame is actually painted
+        self.buildAtlas()
+
+    def renderGlyph(self, text, colour):  # draws one symbol centred in a transparent cell
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(int(self.cellSize * ratio), int(self.cellSize * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setFont(self.glyphFont)
+        painter.setPen(colour)
+        painter.drawText(QRect(0, 0, self.cellSize, self.cellSize), Qt.AlignCenter, text)
+        painter.end()
+        return pixmap
+
+    def buildAtlas(self):  # every symbol in both colours, plus the fixation cross
+        self.atlas = {}
+        for colour in [self.distractorColour, self.targetColour]:
+            self.atlas[colour.name()] = [self.renderGlyph(symbol, colour) for symbol in self.symbols]
+        distractorGlyphs = self.atlas[self.distractorColour.name()][:self.nDistractors]
+        targetGlyphs = self.atlas[self.targetColour.name()][self.nDistractors:]
+        self.glyphs = distractorGlyphs + targetGlyphs  # glyph displayed for each code
+        self.fixation = self.renderGlyph('+', self.fixationColour)
+
+    def setPositions(self, vertices, centreX, centreY):  # caches where each stream is drawn for the whole trial
+        half = self.cellSize/2
+        self.points = [QPoint(int(centreX + x - half), int(centreY - y - half)) for x, y in vertices]
+        self.fixationPoint = QPoint(int(centreX - half), int(centreY - half))
+
+    def showFrame(self, frame, frameNumber):  # flips to the next frame, the actual drawing happens in paintEvent
+        self.frame = frame
+        self.frameNumber = frameNumber
+        self.update()
+
+    def clearFrame(self):  # back to the fixation cross alone
+        self.frame = None
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawPixmap(self.fixationPoint, self.fixation)
+        if self.frame is not None:
+            glyphs = self.glyphs
+            for point, code in zip(self.points, self.frame):
+                painter.drawPixmap(point, glyphs[code])
+        painter.end()
+        if self.timingLog is not None:
+            if self.frame is None:
+                self.timingLog.stampBlank()
+            else:
+                self.timingLog.stampFrame(self.frameNumber)
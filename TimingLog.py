@@ -0,0 +1,166 @@
+""" This module records when the frames of each trial actually appeared on screen. The onsets are kept in preallocated
+arrays during the trial, written to a sidecar .csv file after it, and summarised in a report at the end of the session."""
+
+import numpy as np
+from time import perf_counter_ns
+
+
+class Histogram:  # count, mean, maximum and percentiles of values (ms) in constant memory, however many are added
+    def __init__(self, resolution=0.01, limit=500):
+        self.resolution = resolution  # width of a bin (ms), the precision of the percentiles
+        self.bins = np.zeros(int(limit / resolution) + 1, dtype=np.int32)  # the last bin holds everything above
+        self.reset()
+
+    def reset(self):
+        self.bins[:] = 0
+        self.count = 0
+        self.total = 0.0
+        self.maximum = float('-inf')
+
+    def add(self, values):
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.maximum = max(self.maximum, float(values.max()))
+        np.add.at(self.bins, np.clip((values / self.resolution).astype(np.int64), 0, len(self.bins) - 1), 1)
+
+    def mean(self):
+        return self.total / self.count
+
+    def percentile(self, q):  # lower edge of the bin holding the q-th percentile
+        rank = max(1, int(np.ceil(q / 100 * self.count)))
+        return int(np.searchsorted(np.cumsum(self.bins), rank)) * self.resolution
+
+
+class TimingLog:
+    def __init__(self, framesMax, interval, file, lateMs=8):
+        self.framesMax = framesMax
+        self.interval = interval  # nominal time between frames (ms)
+        self.file = file          # sidecar file, opened in append mode
+        self.lateMs = lateMs      # a frame is late when shown more than half a 60Hz refresh after its deadline
+        # onsets of the frames, followed by the blank after the stream, the answer page and the two key presses
+        # (0 = not shown yet)
+        self.onsets = np.zeros(framesMax + 4, dtype=np.int64)
+        self.blank = framesMax
+        self.answerPage = framesMax + 1
+        self.responses = framesMax + 2
+        self.intervals = Histogram()  # inter-frame intervals (ms) of every trial of the session
+        self.reset()
+
+    def reset(self):  # back to the start, for the session of a new participant
+        self.onsets[:] = 0
+        self.active = False
+        self.origin = 0
+        self.trialNo = 0
+        self.practice = False
+        self.frameT1 = 0
+        self.frameT2 = 0
+        self.trials = 0
+        self.intervals.reset()
+        self.frames = 0               # frames shown, and frames shown late compared to their deadline
+        self.lateFrames = 0
+        self.soaErrors = 0            # trials with both targets shown, and their measured minus nominal T1-T2 SOA (ms)
+        self.soaErrorSum = 0.0
+        self.soaErrorMax = 0.0
+        self.blanks = 0               # trials with the fixation cross back after the stream, and its lateness (ms)
+        self.blankErrorSum = 0.0
+        self.blankErrorMax = 0.0
+
+    def startTrial(self, trialNo, practice, frameT1, frameT2):
+        self.onsets[:] = 0
+        self.trialNo = trialNo
+        self.practice = practice
+        self.frameT1 = frameT1
+        self.frameT2 = frameT2
+        self.active = True
+
+    def startStream(self, origin):  # clock time (ns) the frame deadlines are counted from
+        self.origin = origin
+
+    def stamp(self, index):  # only the first paint of a frame is its onset
+        if self.active and self.onsets[index] == 0:
+            self.onsets[index] = perf_counter_ns()
+
+    def stampFrame(self, frame):  # frames are counted from 1 in the trial
+        self.stamp(frame-1)
+
+    def stampBlank(self):
+        if self.onsets[0] != 0:  # the fixation cross alone before the stream is not a transition
+            self.stamp(self.blank)
+
+    def stampAnswerPage(self):
+        self.stamp(self.answerPage)
+
+    def stampResponse(self, index, clock):  # key press of the answer to T1 (index 0) or T2 (index 1), clock time in ns
+        if self.active:
+            self.onsets[self.responses + index] = clock
+
+    def responseTime(self, index):  # from the answer page appearing to the key press (ms), NaN if either is missing
+        page = self.onsets[self.answerPage]
+        response = self.onsets[self.responses + index]
+        if page == 0 or response == 0:
+            return float('nan')
+        return (response - page) / 1e6
+
+    def endTrial(self):  # writes the onsets of the trial to the sidecar file and keeps its statistics
+        if not self.active:
+            return
+        self.active = False
+        onsetsMs = (self.onsets - self.origin) / 1e6   # relative to the start of the stream
+        deadlinesMs = np.arange(1, self.framesMax + 2) * self.interval
+        shown = self.onsets[:self.framesMax] != 0
+        frameOnsets = onsetsMs[:self.framesMax][shown]
+        self.trials += 1
+        self.intervals.add(np.diff(frameOnsets))
+        self.frames += len(frameOnsets)
+        self.lateFrames += int((frameOnsets - deadlinesMs[:self.framesMax][shown] > self.lateMs).sum())
+        if shown[self.frameT1-1] and shown[self.frameT2-1]:
+            soa = onsetsMs[self.frameT2-1] - onsetsMs[self.frameT1-1]
+            soaError = soa - (self.frameT2 - self.frameT1) * self.interval
+            self.soaErrors += 1
+            self.soaErrorSum += soaError
+            self.soaErrorMax = max(self.soaErrorMax, abs(soaError))
+        if shown[-1] and self.onsets[self.blank] != 0:  # due one frame after the last frame
+            blankError = onsetsMs[self.blank] - deadlinesMs[self.framesMax]
+            self.blanks += 1
+            self.blankErrorSum += blankError
+            self.blankErrorMax = max(self.blankErrorMax, abs(blankError))
+
+        lines = []
+        for index in range(self.framesMax + 4):
+            if self.onsets[index] == 0:
+                continue
+            if index >= self.responses:
+                event, frame, deadline = 'response {0}'.format(index - self.responses + 1), '', ''
+            elif index == self.blank:
+                event, frame, deadline = 'blank', '', '%.3f' % deadlinesMs[self.framesMax]
+            elif index == self.answerPage:
+                event, frame, deadline = 'answer page', '', ''
+            else:
+                event, frame, deadline = 'frame', str(index+1), '%.3f' % deadlinesMs[index]
+                if index+1 == self.frameT1:
+                    event = 'T1'
+                elif index+1 == self.frameT2:
+                    event = 'T2'
+            lines.append('{0},{1},{2},{3},{4:.3f},{5}\n'.format(self.trialNo, int(self.practice), event, frame,
+                                                                 onsetsMs[index], deadline))
+        self.file.write(''.join(lines))
+        self.file.flush()
+
+    def report(self):  # summary of the frame timing of the whole session
+        lines = ['Trials: {0}'.format(self.trials),
+                 'Nominal frame interval (ms): {0}'.format(self.interval)]
+        if self.intervals.count > 0:
+            lines += ['Inter-frame interval (ms): mean {0:.3f}, p95 {1:.3f}, max {2:.3f}'.format(
+                          self.intervals.mean(), self.intervals.percentile(95), self.intervals.maximum)]
+        if self.frames > 0:
+            lines += ['Late frames (> {0} ms after deadline): {1} of {2}'.format(
+                          self.lateMs, self.lateFrames, self.frames)]
+        if self.soaErrors > 0:
+            lines += ['T1-T2 SOA error, measured - nominal (ms): mean {0:.3f}, max |error| {1:.3f}'.format(
+                          self.soaErrorSum / self.soaErrors, self.soaErrorMax)]
+        if self.blanks > 0:
+            lines += ['Fixation cross after the stream, measured - due (ms): mean {0:.3f}, max |error| {1:.3f}'.format(
+                          self.blankErrorSum / self.blanks, self.blankErrorMax)]
+        return '\n'.join(lines) + '\n'
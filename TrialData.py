@@ -0,0 +1,258 @@
+""" This module reads the trial data in chunks of typed columns, from the results database or from .csv files in the
+format of the original experiment, and converts it to a Parquet (or Arrow IPC) dataset partitioned by session date.
+The dataset can then be loaded with filters on lag, distance and outcomes, which are applied while reading.
+
+python TrialData.py export attentionalBlink.db --out trials            database to Parquet
+python TrialData.py export old.csv --date 2019-05-02 --out trials      .csv file (which has no dates) to Parquet
+
+Requires pyarrow for the export and the loader. The chunk readers only need NumPy, and read .csv files faster when
+pyarrow is installed.
+"""
+
+import argparse
+import codecs
+import csv
+import glob
+import hashlib
+import os
+import sqlite3
+
+import numpy as np
+
+# typed columns of the trial data, in the order of the .csv files
+COLUMNS = [('name', str), ('age', np.int16), ('gender', np.int8), ('education', str), ('email', str),
+           ('trialNo', np.int32), ('diffTime', np.float64), ('distanceIndex', np.int16),
+           ('distanceUnits', np.float64), ('outcome1', np.int8), ('outcome2', np.int8), ('rt1', np.float64),
+           ('rt2', np.float64)]
+
+OPTIONAL = ['rt1', 'rt2']  # response times (ms), missing from older files and NaN when unknown
+
+CSV_NAMES = {'Name': 'name', 'Age': 'age', 'Gender': 'gender', 'Education': 'education', 'Email': 'email',
+             'Trial no': 'trialNo', 'Time(s)': 'diffTime', 'Distance(sides)': 'distanceIndex',
+             'Distance(ui units)': 'distanceUnits', 'Outcome 1': 'outcome1', 'Outcome 2': 'outcome2',
+             'RT 1(ms)': 'rt1', 'RT 2(ms)': 'rt2'}
+
+UNKNOWN_DATE = 'unknown'
+
+
+def typedChunk(names, rows, sessionDates):  # columns of a list of rows, converted to their type in one go
+    types = dict(COLUMNS)
+    chunk = {}
+    for i, name in enumerate(names):
+        values = [row[i] for row in rows]
+        if types[name] is str:
+            chunk[name] = values
+        elif name in OPTIONAL:
+            chunk[name] = np.array([np.nan if value in ('', None) else value for value in values], dtype=np.float64)
+        else:
+            chunk[name] = np.array(values).astype(np.float64).astype(types[name])  # accepts '1', '1.0' and 1
+    fillOptional(chunk, len(rows))
+    chunk['sessionDate'] = sessionDates
+    return chunk
+
+
+def fillOptional(chunk, rows):  # NaN columns for the optional columns a file does not have
+    for name in OPTIONAL:
+        if name not in chunk:
+            chunk[name] = np.full(rows, np.nan)
+
+
+def defaultNames(fields):  # column names of a file written without header, from the number of fields of a row
+    names = [name for name, kind in COLUMNS]
+    return names[:max(fields, len(names) - len(OPTIONAL))]
+
+
+def detectEncoding(path):  # encoding of a .csv file: its byte order mark, else the first encoding which decodes it all
+    with open(path, 'rb') as file:
+        start = file.read(4)
+        if start.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if start.startswith(codecs.BOM_UTF16_LE) or start.startswith(codecs.BOM_UTF16_BE):
+            return 'utf-16'
+        for encoding in ['utf-8', 'cp1252']:  # Windows machines of the lab write cp1252
+            file.seek(0)
+            decoder = codecs.getincrementaldecoder(encoding)()
+            try:
+                for block in iter(lambda: file.read(1 << 20), b''):
+                    decoder.decode(block)
+                decoder.decode(b'', final=True)
+                return encoding
+            except UnicodeDecodeError:
+                pass
+    return 'latin-1'  # decodes anything
+
+
+def readCsvHeader(row):  # column names of a header row, None if the row is data (files written without header)
+    cleaned = [field.strip() for field in row]
+    while cleaned and cleaned[-1] == '':  # the original header ends with a comma
+        cleaned.pop()
+    if cleaned and all(field in CSV_NAMES for field in cleaned):
+        return [CSV_NAMES[field] for field in cleaned]
+    return None
+
+
+def readCsvChunks(path, chunkRows=100000, sessionDate=UNKNOWN_DATE, encoding='utf-8'):
+    """ Yields the trials of a .csv file as dicts of typed columns, chunkRows trials at a time. The header of the
+    original experiment (spaces after commas, trailing comma) is understood, and a file without header is read in the
+    default column order."""
+    names = None
+    with open(path, newline='', encoding=encoding) as file:
+        reader = csv.reader(file)
+        rows = []
+        for row in reader:
+            if not row:
+                continue
+            if names is None:
+                names = readCsvHeader(row)
+                if names is not None:
+                    continue
+                names = defaultNames(len(row))
+            rows.append([field.strip() for field in row[:len(names)]])
+            if len(rows) == chunkRows:
+                yield typedChunk(names, rows, [sessionDate] * len(rows))
+                rows = []
+        if rows:
+            yield typedChunk(names, rows, [sessionDate] * len(rows))
+
+
+def readCsvArrowChunks(path, chunkRows=100000, sessionDate=UNKNOWN_DATE, encoding='utf-8'):
+    """ Same as readCsvChunks, with the streaming .csv reader of pyarrow which parses whole blocks at once. Chunks hold
+    about chunkRows trials, string columns are NumPy arrays of objects."""
+    pa = importArrow()
+    import pyarrow.csv
+    with open(path, newline='', encoding=encoding) as file:
+        first = next(csv.reader(file), [])
+    header = readCsvHeader(first)
+    names = header or defaultNames(len(first))
+    types = dict(COLUMNS)
+    columnTypes = {name: pa.string() if types[name] is str else pa.float64() for name in names
+                   if types[name] is str or name in OPTIONAL}
+    reader = pa.csv.open_csv(path, read_options=pa.csv.ReadOptions(column_names=names, skip_rows=1 if header else 0,
+                                                                    encoding=encoding, block_size=chunkRows * 64),
+                             convert_options=pa.csv.ConvertOptions(column_types=columnTypes))
+    for batch in reader:
+        chunk = {}
+        for name in names:
+            values = batch.column(name).to_numpy(zero_copy_only=False)
+            chunk[name] = values if types[name] is str else values.astype(np.float64).astype(types[name])
+        fillOptional(chunk, batch.num_rows)
+        chunk['sessionDate'] = [sessionDate] * batch.num_rows
+        yield chunk
+
+
+def readDatabaseChunks(path, chunkRows=100000):  # trials of a results database, with the date of their session
+    connection = sqlite3.connect(path)
+    existing = {row[1] for row in connection.execute('PRAGMA table_info(trials)')}
+    optional = ', '.join(name if name in existing else 'NULL' for name in OPTIONAL)  # older databases have no RTs
+    diffTime = 'diffTime' if 'diffTime' in existing else 'lag'  # named lag before, see ResultsStore.RENAMED_COLUMNS
+    cursor = connection.execute('SELECT name, age, gender, education, email, trialNo, {0}, distanceSides, '
+                                'distanceUnits, outcome1, outcome2, {1}, substr(sessionStart, 1, 10) FROM trials '
+                                'JOIN participants USING (participantId) '
+                                'ORDER BY participantId, trialNo'.format(diffTime, optional))
+    names = [name for name, kind in COLUMNS]
+    while True:
+        rows = cursor.fetchmany(chunkRows)
+        if not rows:
+            break
+        yield typedChunk(names, rows, [row[-1] for row in rows])
+    connection.close()
+
+
+def readChunks(path, chunkRows=100000, sessionDate=UNKNOWN_DATE):  # database or .csv file, from the extension
+    if path.endswith('.db'):
+        return readDatabaseChunks(path, chunkRows)
+    encoding = detectEncoding(path)
+    if hasArrow():
+        return readCsvArrowChunks(path, chunkRows, sessionDate, encoding)
+    return readCsvChunks(path, chunkRows, sessionDate, encoding)
+
+
+def hasArrow():
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+
+def importArrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError:
+        raise SystemExit('pyarrow is needed for the columnar dataset: pip install pyarrow')
+    return pyarrow
+
+
+def arrowSchema(pa):
+    kinds = {str: pa.string(), np.int8: pa.int8(), np.int16: pa.int16(), np.int32: pa.int32(),
+             np.float64: pa.float64()}
+    return pa.schema([(name, kinds[kind]) for name, kind in COLUMNS] + [('sessionDate', pa.string())])
+
+
+def exportDataset(chunks, folder, fileFormat='parquet', source='trials'):
+    """ Writes chunks of trials to a dataset partitioned by session date (folder/sessionDate=.../). Rows are sorted by
+    condition in every file, so the statistics of each row group let the loader skip the other conditions. The files
+    are named after the source, and those of an earlier export of the same source are replaced: exporting a growing
+    database again never duplicates its trials, and the other sources of the dataset are kept."""
+    pa = importArrow()
+    schema = arrowSchema(pa)
+
+    def batches():
+        for chunk in chunks:
+            table = pa.table(chunk, schema=schema).sort_by([('diffTime', 'ascending'), ('distanceIndex', 'ascending')])
+            yield from table.to_batches(max_chunksize=10000)
+
+    key = hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:12]  # same name for the same source
+    for path in glob.glob(os.path.join(glob.escape(folder), '*', 'part-{0}-*.{1}'.format(key, fileFormat))):
+        os.remove(path)
+    pa.dataset.write_dataset(batches(), folder, schema=schema, format=fileFormat,
+                             partitioning=pa.dataset.partitioning(pa.schema([('sessionDate', pa.string())]),
+                                                                   flavor='hive'),
+                             basename_template='part-{0}-{{i}}.{1}'.format(key, fileFormat),
+                             existing_data_behavior='overwrite_or_ignore',  # the files of the other sources stay
+                             max_rows_per_group=10000)
+
+
+def trialFilter(lags=None, distances=None, outcome1=None, outcome2=None, dates=None):  # None keeps every value
+    pa = importArrow()
+    field = pa.dataset.field
+    conditions = [(field('diffTime'), lags), (field('distanceIndex'), distances), (field('outcome1'), outcome1),
+                  (field('outcome2'), outcome2), (field('sessionDate'), dates)]
+    expression = None
+    for column, values in conditions:
+        if values is None:
+            continue
+        condition = column.isin(list(values))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def openDataset(folder, fileFormat='parquet'):
+    pa = importArrow()
+    return pa.dataset.dataset(folder, schema=arrowSchema(pa), format=fileFormat, partitioning='hive')
+
+
+def loadTrials(folder, columns=None, fileFormat='parquet', **filters):
+    """ Loads the trials of a dataset as a pyarrow Table, e.g. loadTrials('trials', lags=[0.28], distances=[0, 1]).
+    Partitions and row groups which cannot match the filters are never read."""
+    return openDataset(folder, fileFormat).to_table(columns=columns, filter=trialFilter(**filters))
+
+
+def iterTrials(folder, columns=None, fileFormat='parquet', **filters):  # same as loadTrials, one batch at a time
+    return openDataset(folder, fileFormat).to_batches(columns=columns, filter=trialFilter(**filters))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help='convert results to a partitioned dataset')
+    export.add_argument('sources', nargs='+', help='results databases (.db) or .csv files')
+    export.add_argument('--out', required=True, help='dataset folder')
+    export.add_argument('--format', default='parquet', choices=['parquet', 'ipc'], help='ipc = Arrow IPC files')
+    export.add_argument('--date', default=UNKNOWN_DATE, help='session date of the .csv files, which do not record it')
+    export.add_argument('--chunk', type=int, default=100000, help='trials read at a time')
+    options = parser.parse_args()
+
+    for source in options.sources:
+        exportDataset(readChunks(source, options.chunk, options.date), options.out, options.format, source)
@@ -0,0 +1,44 @@
+""" This module contains the pipeline running the steps of the trials (fixation, stimuli, response, feedback) on timers
+it owns, so that every step still pending can be cancelled at once. The current step is kept in state, and the work
+of the next trial is done while the answer page waits for the participant."""
+
+from PyQt5.QtCore import *
+
+IDLE, FIXATION, STIMULI, RESPONSE, FEEDBACK = 'idle', 'fixation', 'stimuli', 'response', 'feedback'
+
+
+class TrialPipeline(QObject):
+    def __init__(self, parent=None, timeScale=1):
+        super().__init__(parent)
+        self.timeScale = timeScale  # 0 in simulations, every step follows the previous one straight away
+        self.timers = []            # steps waiting for their time
+        self.state = IDLE
+
+    def after(self, milliseconds, step):  # runs step once, milliseconds (scaled) from now, unless cancelled before
+        self.at(milliseconds * self.timeScale, step)
+
+    def at(self, milliseconds, step):  # same, milliseconds already scaled (e.g. measured on a scaled frame clock)
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.setTimerType(Qt.PreciseTimer)
+        timer.timeout.connect(lambda: self.run(timer, step))
+        self.timers.append(timer)
+        timer.start(int(milliseconds))
+
+    def run(self, timer, step):
+        self.timers.remove(timer)
+        timer.deleteLater()
+        step()
+
+    def enter(self, state):
+        self.state = state
+
+    def cancel(self):  # drops every pending step, e.g. when the session is stopped in the middle of a trial
+        for timer in self.timers:
+            timer.stop()
+            timer.deleteLater()
+        self.timers = []
+        self.state = IDLE
+
+    def pending(self):
+        return len(self.timers)
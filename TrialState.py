@@ -0,0 +1,120 @@
+""" This module holds the state of the experiment: the trial being presented and the session it belongs to, with the
+logic drawing and scoring a trial. It does not depend on Qt, so trials can be generated without any widget. All the
+arrays are allocated once per session, so memory stays flat however many trials are run.
+
+The randomness of a session comes from its seed: every block and every trial draws from a generator of its own, seeded
+with the seed of the session and the number of the block or trial, so any trial can be drawn again on its own."""
+
+import numpy as np
+
+from Design import LAG, DISTANCE, FRAME_T1, STREAM_T1, STREAM_T2, T1, T2
+from Schedule import buildSchedule
+
+BLOCK_STREAM, TRIAL_STREAM = 1, 2  # random streams derived from the seed of a session
+PRACTICE_BLOCK, MAIN_BLOCK = 0, 1
+
+
+class TrialState:  # everything about the current trial, overwritten by the next one
+    __slots__ = ['framesMax', 'streams', 'schedule', 'T1', 'T2', 'frameT1', 'frameT2', 'index1', 'index2',
+                 'diffPosition', 'shift', 'layout', 'frameCount', 'answers', 'outcomes', 'responseTimes',
+                 'distanceIndex', 'distanceUnits']
+
+    def __init__(self, framesMax, streams):
+        self.framesMax = framesMax
+        self.streams = streams
+        self.schedule = np.zeros((framesMax, streams), dtype=np.uint8)  # symbol code of every frame and stream
+        self.answers = ['', '']                                         # digits typed for T1 and T2
+        self.outcomes = np.zeros(2, dtype=np.int8)                      # 1 = correct, 0 = incorrect
+        self.responseTimes = np.zeros(2)                                # ms from the answer page to each key press
+        self.layout = None                                              # positions of the streams (Layout.py)
+        self.reset()
+
+    def reset(self):
+        self.T1 = self.T2 = 0
+        self.frameT1 = self.frameT2 = 0    # frames are counted from 1
+        self.index1 = self.index2 = 0      # streams of the targets
+        self.diffPosition = 0
+        self.shift = 0                     # rotation of the polygon (degrees)
+        self.frameCount = 0                # frames presented so far
+        self.answers[0] = self.answers[1] = ''
+        self.outcomes[:] = 0
+        self.responseTimes[:] = np.nan
+        self.distanceIndex = 0
+        self.distanceUnits = 0.0
+
+    @property
+    def diffFrame(self):  # lag between the targets, in frames
+        return self.frameT2 - self.frameT1
+
+    @property
+    def targetsChosen(self):
+        return self.T1, self.T2
+
+
+class SessionState:  # counters of the session, and design of the current block
+    __slots__ = ['trial', 'nextTrial', 'prepared', 'trialCount', 'answerCount', 'design', 'designRow', 'seed']
+
+    def __init__(self, framesMax, streams):
+        self.trial = TrialState(framesMax, streams)
+        self.nextTrial = TrialState(framesMax, streams)  # prepared while the current trial waits for its answers
+        self.reset()
+
+    def reset(self):  # back to the start, for a new participant
+        self.trial.reset()
+        self.nextTrial.reset()
+        self.prepared = False
+        self.trialCount = 0
+        self.answerCount = 0
+        self.seed = 0  # drawn for every participant, see newSeed
+        self.startBlock(np.zeros((0, 7), dtype=np.int16))
+
+    def startBlock(self, design):  # conditions of the next trials, one row per trial (see Design.buildDesign)
+        self.design = design
+        self.designRow = 0
+
+    def swapTrials(self):  # the prepared trial becomes the current one, the old one is reused for the next
+        self.trial, self.nextTrial = self.nextTrial, self.trial
+        self.prepared = False
+
+
+def newSeed():  # seed of a new session, small enough for an SQLite integer
+    return int(np.random.SeedSequence().entropy % 2**63)
+
+
+def blockRng(seed, block):  # generator drawing the design of a block
+    return np.random.default_rng([seed, BLOCK_STREAM, block])
+
+
+def trialRng(seed, number):  # generator drawing a trial, numbered from 1 in the session, practice included
+    return np.random.default_rng([seed, TRIAL_STREAM, number])
+
+
+def drawShift(rng):  # rotation of the polygon (degrees), 0 to 360 as randint(0, 360)
+    return int(rng.integers(0, 361))
+
+
+def takeTrial(trial, session):  # targets, frames and streams of the next trial, from the design of the block
+    row = session.design[session.designRow]
+    session.designRow += 1
+    trial.T1 = int(row[T1])
+    trial.T2 = int(row[T2])
+    trial.frameT1 = int(row[FRAME_T1])
+    trial.frameT2 = trial.frameT1 + int(row[LAG])
+    trial.index1 = int(row[STREAM_T1])
+    trial.index2 = int(row[STREAM_T2])
+    trial.diffPosition = int(row[DISTANCE])
+
+
+def fillSchedule(trial, nDistractors, codeT1, codeT2, rng=None):  # precomputes the symbols of every frame of the trial
+    trial.schedule[:] = buildSchedule(trial.framesMax, trial.streams, nDistractors, trial.frameT1, trial.frameT2,
+                                      trial.index1, trial.index2, codeT1, codeT2, rng)
+
+
+def measureDistance(trial, layout):  # distance between T1 and T2 in number of sides and in units, from the tables
+    trial.distanceIndex = int(layout.steps[trial.index1, trial.index2])
+    trial.distanceUnits = float(layout.distances[trial.index1, trial.index2])
+
+
+def scoreTrial(trial):  # accuracy of the digits typed for T1 and T2
+    for index in range(2):
+        trial.outcomes[index] = int(trial.answers[index] == str(trial.targetsChosen[index]))
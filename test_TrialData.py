@@ -0,0 +1,37 @@
+""" Exporting the trials to a dataset (TrialData.exportDataset), run with python -m pytest."""
+
+import pytest
+
+from ResultsStore import ResultsStore
+from TrialData import exportDataset, loadTrials, readChunks
+
+pytest.importorskip('pyarrow')
+
+
+def makeDatabase(path, name, trials):
+    store = ResultsStore(path)
+    store.addParticipant(name, 25, 0, 'University', name + '@mail', 1, '{}')
+    for trialNo in range(1, trials + 1):
+        store.addTrial(trialNo, 0.14 * (trialNo % 6 + 1), trialNo % 4, 10.0, 1, trialNo % 2, 500.0, 600.0)
+    store.close()
+
+
+def test_exportAgainReplacesTheSource(tmp_path):
+    database = str(tmp_path / 'results.db')
+    folder = str(tmp_path / 'trials')
+    makeDatabase(database, 'Ann', 50)
+    exportDataset(readChunks(database), folder, source=database)
+    exportDataset(readChunks(database), folder, source=database)
+    assert loadTrials(folder).num_rows == 50
+
+
+def test_exportKeepsOtherSources(tmp_path):
+    first, second = str(tmp_path / 'first.db'), str(tmp_path / 'second.db')
+    folder = str(tmp_path / 'trials')
+    makeDatabase(first, 'Ann', 50)
+    makeDatabase(second, 'Bob', 30)
+    exportDataset(readChunks(first), folder, source=first)
+    exportDataset(readChunks(second), folder, source=second)
+    makeDatabase(first, 'Cid', 20)  # the database grew, exported again
+    exportDataset(readChunks(first), folder, source=first)
+    assert loadTrials(folder).num_rows == 100
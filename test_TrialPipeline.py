@@ -0,0 +1,55 @@
+""" Timing of the end of a stream (FrameScheduler.py, TrialPipeline.py), run with python -m pytest."""
+
+import os
+from time import perf_counter_ns
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QCoreApplication, QTimer
+
+from FrameScheduler import FrameScheduler
+from TrialPipeline import TrialPipeline
+
+app = QCoreApplication.instance() or QCoreApplication([])
+guard = QTimer()  # quits the event loop of a test whose step never runs
+guard.setSingleShot(True)
+guard.timeout.connect(app.quit)
+
+
+def wait(milliseconds):  # runs the event loop until app.quit, milliseconds at most
+    guard.start(milliseconds)
+    app.exec_()
+    guard.stop()
+
+
+def blankAfterStream(interval, timeScale, frames=5):  # ms between the deadline of frame frames + 1 and the blank
+    scheduler = FrameScheduler()
+    pipeline = TrialPipeline(timeScale=timeScale)
+    blank = []
+
+    def showFrame():  # as FunModule.endTrial, on the last frame
+        if scheduler.frame == frames:
+            scheduler.stop()
+            pipeline.at(scheduler.untilNext(), lambda: (blank.append(perf_counter_ns()), app.quit()))
+
+    scheduler.start(interval * timeScale, showFrame)
+    wait(int(interval * timeScale * (frames + 5)))
+    assert blank, 'the fixation cross never came back'
+    return (blank[0] - scheduler.deadline(frames + 1)) / 1e6
+
+
+def test_blankOneFrameAfterTheLastFrame():
+    assert abs(blankAfterStream(50, 1)) < 25
+
+
+def test_blankOneFrameAfterTheLastFrameScaled():  # the frame clock is scaled already, the pipeline must not scale again
+    assert abs(blankAfterStream(50, 2)) < 50
+
+
+def test_afterIsScaled():
+    pipeline = TrialPipeline(timeScale=2)
+    start = perf_counter_ns()
+    done = []
+    pipeline.after(50, lambda: (done.append(perf_counter_ns()), app.quit()))
+    wait(1000)
+    assert done and (done[0] - start) / 1e6 >= 100
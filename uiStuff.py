@@ -1,18 +1,22 @@
 """This code is used to initialise PyQt and enable display of user Interface"""
 
 import sys
+import os
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
-from DesignerCode import *
+from LazyPages import *
+
+if '--headless' in sys.argv:  # simulated participant, nothing is displayed
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
 
 QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
 app = QApplication(sys.argv)
 
 window = QMainWindow()
-ui = Ui_MainWindow()
+ui = LazyUi(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'DesignerFile.ui'))
 
-ui.setupUi(window)
+ui.setupUi(window)  # only the consent page is built here, the others when needed or in idle time, see LazyPages.py
 
 
 